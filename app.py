@@ -1,3 +1,4 @@
+import json
 import os
 from flask import Flask
 from pymongo import MongoClient
@@ -17,7 +18,10 @@ def create_app():
     # -----------------------
     #  MongoDB connection
     # -----------------------
-    client = MongoClient(mongo_uri)
+    # With QUERY_STATS=1 a listener counts the commands each request sends (see utils/unit_of_work.py)
+    from utils.unit_of_work import query_listeners
+
+    client = MongoClient(mongo_uri, event_listeners=query_listeners())
     app.db = client[db_name]
 
     # Collections
@@ -27,17 +31,48 @@ def create_app():
 
     app.focus_sessions = app.db["focus_sessions"]
     app.break_sessions = app.db["break_sessions"]
+    app.focus_rollups = app.db["focus_rollups"]
 
     app.projects = app.db["projects"]
     app.tags = app.db["tags"]
     app.settings = app.db["settings"]
     app.audit_logs = app.db["audit_logs"]
+    app.migrations = app.db["migrations"]
+    app.migration_progress = app.db["migration_progress"]
+    app.data_versions = app.db["data_versions"]
+    app.daily_stats = app.db["daily_stats"]
+
+    # Archive tier (see model/archive_model.py)
+    app.tasks_archive = app.db["tasks_archive"]
+    app.focus_sessions_archive = app.db["focus_sessions_archive"]
+    app.break_sessions_archive = app.db["break_sessions_archive"]
+    app.archive_stats = app.db["archive_stats"]
 
     # -----------------------
     #  Security Pepper
     # -----------------------
     app.config["PEPPER"] = os.environ.get("PEPPER", "MY_SUPER_SECRET_KEY_123")
 
+    # Password KDF for new hashes (run `flask calibrate-kdf` to pick the cost);
+    # older hashes are upgraded on the next successful login.
+    app.config["PASSWORD_KDF"] = os.environ.get("PASSWORD_KDF", "scrypt")
+    app.config["SCRYPT_N"] = int(os.environ.get("SCRYPT_N", str(2**14)))
+    app.config["SCRYPT_R"] = int(os.environ.get("SCRYPT_R", "8"))
+    app.config["SCRYPT_P"] = int(os.environ.get("SCRYPT_P", "1"))
+    app.config["PBKDF2_ITERATIONS"] = int(os.environ.get("PBKDF2_ITERATIONS", "600000"))
+    app.config["HASH_WORKERS"] = int(os.environ.get("HASH_WORKERS", str(os.cpu_count() or 2)))
+
+    # -----------------------
+    #  Retention / archiving
+    # -----------------------
+    app.config["ARCHIVE_TASKS_AFTER_DAYS"] = int(os.environ.get("ARCHIVE_TASKS_AFTER_DAYS", "30"))
+    app.config["ARCHIVE_SESSIONS_AFTER_DAYS"] = int(os.environ.get("ARCHIVE_SESSIONS_AFTER_DAYS", "180"))
+    app.config["AUDIT_RETENTION_DAYS"] = int(os.environ.get("AUDIT_RETENTION_DAYS", "365"))
+
+    # Dashboard priority weights per list, e.g. {"quick_wins": {"complexity": -3}}
+    # (see model/priority_model.py); open tasks are rescored when they change.
+    app.config["PRIORITY_WEIGHTS"] = json.loads(os.environ.get("PRIORITY_WEIGHTS", "{}"))
+
     # -----------------------
     #  Register Blueprints
     # -----------------------
@@ -50,6 +85,7 @@ def create_app():
     from routes.timer_break import timer_break_bp
     from routes.projects import projects_bp
     from routes.settings import settings_bp
+    from routes.export import export_bp
 
     app.register_blueprint(splash_bp)
     app.register_blueprint(login_bp)
@@ -60,6 +96,34 @@ def create_app():
     app.register_blueprint(timer_break_bp)
     app.register_blueprint(projects_bp)
     app.register_blueprint(settings_bp)
+    app.register_blueprint(export_bp)
+
+    # -----------------------
+    #  CLI, audit writer, caches, indexes / migrations
+    # -----------------------
+    from cli import register_commands
+    from model.migrations import start_background_migrations
+    from utils.audit import init_audit
+    from utils.cache import init_cache
+    from model.settings_model import init_settings_cache
+    from utils.unit_of_work import init_unit_of_work
+
+    register_commands(app)
+    init_audit(app)
+    init_cache(app)
+    init_settings_cache(app)
+    init_unit_of_work(app)
+
+    # Index builds run off the request path; set AUTO_MIGRATE=0 to only use `flask migrate`.
+    if os.environ.get("AUTO_MIGRATE", "1") == "1":
+        start_background_migrations(app)
+
+    # Periodic archive pass; set ARCHIVE_INTERVAL=0 and run `flask archive` from cron instead.
+    archive_interval = float(os.environ.get("ARCHIVE_INTERVAL", "3600"))
+    if archive_interval > 0:
+        from model.archive_model import start_background_archiver
+
+        start_background_archiver(app, archive_interval)
 
     return app
 
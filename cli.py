@@ -0,0 +1,293 @@
+"""Flask CLI commands (run with `flask --app app <command>`)."""
+
+from __future__ import annotations
+
+import random
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import click
+from bson import ObjectId
+from flask import current_app
+from flask.cli import with_appcontext
+
+from model.archive_model import rebuild_archive_stats, run_archive
+from model.focus_model import rebuild_focus_rollups
+from model.import_model import BATCH_SIZE as IMPORT_BATCH_SIZE, FORMATS as IMPORT_FORMATS, import_tasks
+from model.migrations import MIGRATIONS, applied_versions, run_migrations
+from model.priority_model import profile_weights, refresh_priorities, rescore_all, score_fields
+from model.stats_model import rebuild_daily_stats
+from model.task_buckets import bucketize
+from model.task_schema import migrate_task_schema, task_schema_progress
+from model.task_view import TaskView
+from routes.dashboard import dashboard_buckets
+from utils.security import KDFS, calibrate_kdf
+
+
+@click.command("migrate")
+@click.option("--status", is_flag=True, help="Only list applied / pending migrations.")
+@with_appcontext
+def migrate_command(status: bool):
+    """Create indexes and apply pending schema migrations."""
+    if status:
+        done = applied_versions()
+        for version, description, _ in MIGRATIONS:
+            mark = "x" if version in done else " "
+            click.echo(f"[{mark}] {version:03d} {description}")
+        return
+
+    applied = run_migrations()
+    if applied:
+        click.echo(f"Applied migrations: {', '.join(str(v) for v in applied)}")
+    else:
+        click.echo("Database is up to date.")
+
+
+@click.command("rebuild-focus-rollups")
+@click.option("--user-id", default=None, help="Only rebuild this user's rollups.")
+@click.option("--dry-run", is_flag=True, help="Report drift without writing.")
+@with_appcontext
+def rebuild_focus_rollups_command(user_id: str | None, dry_run: bool):
+    """Recompute per-task focus rollups from raw focus sessions."""
+    report = rebuild_focus_rollups(user_id=user_id, apply=not dry_run)
+    click.echo(
+        f"Checked {report['users']} user(s), {report['users_with_drift']} with drift: "
+        f"{report['missing']} missing, {report['stale']} stale, {report['orphaned']} orphaned rollup(s)."
+    )
+    if report["skipped"]:
+        click.echo(f"{report['skipped']} rollup(s) kept changing under new sessions; re-run to retry them.")
+    if dry_run:
+        click.echo("Dry run: nothing was written.")
+
+
+@click.command("backfill-daily-stats")
+@click.option("--user-id", default=None, help="Only rebuild this user's days.")
+@click.option("--include-today", is_flag=True, help="Also rebuild today, which live ingestion is still adding to.")
+@with_appcontext
+def backfill_daily_stats_command(user_id: str | None, include_today: bool):
+    """Recompute per-day activity stats from raw focus / break sessions."""
+    report = rebuild_daily_stats(user_id=user_id, include_today=include_today)
+    click.echo(
+        f"Wrote {report['days']} day document(s) for {report['users']} user(s), "
+        f"removed {report['removed']} empty day(s)."
+    )
+    if report["skipped"]:
+        click.echo(f"{report['skipped']} day(s) kept changing under live ingestion; re-run to retry them.")
+
+
+@click.command("import-tasks")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--email", required=True, help="Account that will own the tasks.")
+@click.option("--format", "fmt", type=click.Choice(IMPORT_FORMATS), default=None, help="Default: from the extension.")
+@click.option("--batch-size", default=IMPORT_BATCH_SIZE, show_default=True)
+@with_appcontext
+def import_tasks_command(path: str, email: str, fmt: str | None, batch_size: int):
+    """Import tasks from a CSV or NDJSON file."""
+    user = current_app.users.find_one({"email": email.lower().strip()}, {"_id": 1})
+    if not user:
+        raise click.ClickException(f"No user with email {email}")
+    fmt = fmt or ("ndjson" if path.endswith((".ndjson", ".jsonl")) else "csv")
+
+    with open(path, "rb") as fh:
+        report = import_tasks(str(user["_id"]), fh, fmt, batch_size=batch_size)
+    click.echo(
+        f"{report['imported']}/{report['rows']} row(s) imported, {report['failed']} failed, "
+        f"{report['projects_created']} project(s) created."
+    )
+    for err in report["errors"][:20]:
+        click.echo(f"  row {err['row']}: {err['error']}")
+    if report["failed"] > 20:
+        click.echo(f"  ... and {report['failed'] - 20} more")
+
+
+@click.command("archive")
+@click.option("--batch-size", default=500, show_default=True)
+@click.option("--max-batches", default=None, type=int, help="Stop after this many batches per collection.")
+@click.option("--rebuild-stats", is_flag=True, help="Only recompute archived task counters.")
+@with_appcontext
+def archive_command(batch_size: int, max_batches: int | None, rebuild_stats: bool):
+    """Move old completed tasks and sessions to the archive tier and apply audit log retention."""
+    if rebuild_stats:
+        report = rebuild_archive_stats()
+        click.echo(f"Rebuilt archive counters for {report['users']} user(s).")
+        return
+
+    report = run_archive(batch_size, max_batches)
+    if report is None:
+        raise click.ClickException("Another archive pass is running.")
+    click.echo(
+        f"Archived {report['tasks']} task(s), {report['focus_sessions']} focus and "
+        f"{report['break_sessions']} break session(s) for {report['users']} user(s)."
+    )
+
+
+@click.command("rescore-tasks")
+@click.option("--user-id", default=None, help="Only rescore this user's open tasks.")
+@with_appcontext
+def rescore_tasks_command(user_id: str | None):
+    """Recompute the stored dashboard priority scores of open tasks (run daily, or after changing weights)."""
+    today = datetime.utcnow().date()
+    if user_id:
+        tasks = refresh_priorities(user_id, today, force=True)
+        report = {"users": 1 if tasks is not None else 0, "tasks": len(tasks or [])}
+    else:
+        report = rescore_all(today)
+    click.echo(f"Rescored {report['tasks']} open task(s) for {report['users']} user(s).")
+
+
+@click.command("migrate-tasks")
+@click.option("--batch-size", default=500, show_default=True)
+@click.option("--max-batches", default=None, type=int, help="Stop after this many batches (resume later).")
+@click.option("--status", is_flag=True, help="Only print progress.")
+@with_appcontext
+def migrate_tasks_command(batch_size: int, max_batches: int | None, status: bool):
+    """Upgrade stored tasks to the current task schema (resumable)."""
+    progress = task_schema_progress() if status else migrate_task_schema(batch_size, max_batches)
+    done = progress["total"] - progress["pending"]
+    click.echo(
+        f"Task schema v{progress['version']}: {done}/{progress['total']} task(s) current, "
+        f"{progress['pending']} pending."
+    )
+
+
+@click.command("calibrate-kdf")
+@click.option("--kdf", "name", type=click.Choice(KDFS), default="scrypt", show_default=True)
+@click.option("--target-ms", default=100.0, show_default=True, help="Wanted time for one verify on this machine.")
+def calibrate_kdf_command(name: str, target_ms: float):
+    """Pick password KDF parameters for this hardware and print the env vars to set."""
+    kdf, elapsed = calibrate_kdf(name, target_ms)
+    click.echo(f"{name}: {elapsed:.1f}ms per hash")
+    click.echo(f"PASSWORD_KDF={name}")
+    if name == "scrypt":
+        click.echo(f"SCRYPT_N={kdf['n']}\nSCRYPT_R={kdf['r']}\nSCRYPT_P={kdf['p']}")
+    else:
+        click.echo(f"PBKDF2_ITERATIONS={kdf['iterations']}")
+
+
+def _percentiles(samples: list[float]) -> dict:
+    ordered = sorted(samples)
+    if not ordered:
+        return {}
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": ordered[-1]}
+
+
+@click.command("bench-auth")
+@click.option("--users", default=200, show_default=True, help="Throwaway accounts to register and log in.")
+@click.option("--concurrency", default=16, show_default=True)
+@with_appcontext
+def bench_auth_command(users: int, concurrency: int):
+    """Measure /register and /login latency under concurrent load (cleans up after itself)."""
+    app = current_app._get_current_object()
+    run_id = uuid.uuid4().hex[:8]
+    password = f"bench-{run_id}"
+    emails = [f"bench-{run_id}-{i}@example.invalid" for i in range(users)]
+
+    def post(path: str, data: dict) -> tuple[float, bool]:
+        client = app.test_client()
+        started = time.perf_counter()
+        resp = client.post(path, data=data)
+        return (time.perf_counter() - started) * 1000, resp.status_code == 302
+
+    phases = {
+        "register": [("/register", {"name": "Bench", "email": e, "password": password, "confirm": password}) for e in emails],
+        "login": [("/login", {"email": e, "password": password}) for e in emails],
+    }
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for phase, calls in phases.items():
+                results = list(pool.map(lambda call: post(*call), calls))
+                stats = _percentiles([ms for ms, _ in results])
+                failed = sum(1 for _, ok in results if not ok)
+                click.echo(
+                    f"{phase:<8} n={len(results)} failed={failed} "
+                    + " ".join(f"{k}={v:.1f}ms" for k, v in stats.items())
+                )
+    finally:
+        ids = [str(u["_id"]) for u in app.users.find({"email": {"$in": emails}}, {"_id": 1})]
+        app.users.delete_many({"email": {"$in": emails}})
+        for name in ("projects", "tags", "settings"):
+            getattr(app, name).delete_many({"user_id": {"$in": ids}})
+        app.data_versions.delete_many({"_id": {"$in": ids}})
+        # Audit events are written in the background; flush them before deleting.
+        app.audit_writer.close()
+        app.audit_logs.delete_many({"user_id": {"$in": ids}})
+
+
+def _synthetic_tasks(n: int, today, weights: dict, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    tasks = []
+    for _ in range(n):
+        doc = {
+            "_id": ObjectId(),
+            "title": "bench",
+            "due_date": datetime.combine(today, datetime.min.time()) + timedelta(days=rng.randint(-10, 40))
+            if rng.random() < 0.8
+            else "",
+            "importance": rng.choice(("Low", "Medium", "High")),
+            "complexity": rng.randint(1, 5),
+            "energy": rng.randint(1, 5),
+            "completed": False,
+        }
+        doc["priority"] = score_fields(doc, today, rng.choice((0, 0, 25, 50)), weights)
+        tasks.append(TaskView(doc))
+    return tasks
+
+
+@click.command("bench-buckets")
+@click.option("--sizes", default="1000,5000,10000", show_default=True, help="Comma-separated task counts.")
+@click.option("--repeat", default=5, show_default=True, help="Best of this many runs per size.")
+@with_appcontext
+def bench_buckets_command(sizes: str, repeat: int):
+    """Time the dashboard's single bucketize pass against one filter + sort per list (in memory, no database)."""
+    today = datetime.utcnow().date()
+    buckets = dashboard_buckets("focused", today)
+    weights = profile_weights()
+
+    for n in (int(s) for s in sizes.split(",") if s.strip()):
+        tasks = _synthetic_tasks(n, today, weights)
+        reads = 0
+
+        def counted():
+            nonlocal reads
+            for t in tasks:
+                reads += 1
+                yield t
+
+        def single_pass():
+            return bucketize(counted(), buckets)
+
+        def per_list():
+            out = {}
+            for b in buckets:
+                matches = [t for t in counted() if b.when is None or b.when(t)]
+                if b.key is not None:
+                    matches = sorted(matches, key=b.key, reverse=b.largest)
+                out[b.name] = (len(matches), matches if b.k is None else matches[: b.k])
+            return out
+
+        for label, fn in (("single pass", single_pass), ("per list", per_list)):
+            best = float("inf")
+            for _ in range(repeat):
+                reads = 0
+                started = time.perf_counter()
+                fn()
+                best = min(best, time.perf_counter() - started)
+            click.echo(
+                f"n={n:<6} {label:<12} {best * 1000:8.2f}ms  {best * 1e6 / n:6.2f}us/task  passes={reads / n:g}"
+            )
+
+
+def register_commands(app):
+    app.cli.add_command(migrate_command)
+    app.cli.add_command(rebuild_focus_rollups_command)
+    app.cli.add_command(migrate_tasks_command)
+    app.cli.add_command(backfill_daily_stats_command)
+    app.cli.add_command(import_tasks_command)
+    app.cli.add_command(archive_command)
+    app.cli.add_command(rescore_tasks_command)
+    app.cli.add_command(bench_auth_command)
+    app.cli.add_command(bench_buckets_command)
+    app.cli.add_command(calibrate_kdf_command)
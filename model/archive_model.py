@@ -0,0 +1,351 @@
+"""Archive tier.
+
+Completed tasks that have been done for ``ARCHIVE_TASKS_AFTER_DAYS`` and
+focus / break sessions older than ``ARCHIVE_SESSIONS_AFTER_DAYS`` are moved,
+in batches, into ``tasks_archive``, ``focus_sessions_archive`` and
+``break_sessions_archive``. Pages and insights only query the live
+collections, so their working set follows active work instead of account age.
+
+What the moved documents contributed is kept elsewhere:
+
+- sessions are already summed in focus rollups and daily stats
+- archived tasks are counted per user (and per project, with their focus
+  minutes) in ``archive_stats``, which dashboard / insights / project counts add
+
+A move copies a batch into the archive, deletes from the live collection only
+the documents that are unchanged since they were read, and takes back the
+rest (e.g. a task reopened or edited), so an interrupted run can simply be
+repeated. Task batches are journaled in ``migration_progress`` before the
+delete and the counters record which batch they already include, so the next
+run finishes counting a batch that was interrupted. Audit logs are not archived; they
+expire through a TTL index after ``AUDIT_RETENTION_DAYS``.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from flask import current_app
+from pymongo import DeleteOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError
+
+from model.focus_model import focus_by_task
+from model.session_model import MAX_BACKDATE
+from utils.audit import audit
+from utils.cache import bump_data_version
+
+log = logging.getLogger(__name__)
+
+# live collection -> archive collection
+ARCHIVES = {
+    "tasks": "tasks_archive",
+    "focus_sessions": "focus_sessions_archive",
+    "break_sessions": "break_sessions_archive",
+}
+
+BATCH_SIZE = 500
+LEASE_ID = "archive_lease"
+LEASE_TTL = timedelta(minutes=30)
+JOURNAL_PREFIX = "archive_batch:"
+_DUPLICATE_KEY = 11000
+
+
+def _collection(name: str):
+    return current_app.db[name]
+
+
+# -----------------------
+#  Archived task counters
+# -----------------------
+def archived_task_counts(user_id: str) -> dict:
+    """{"tasks": n, "projects": {project_id: {"tasks", "focus_minutes"}}} for archived tasks."""
+    doc = current_app.archive_stats.find_one({"user_id": user_id}, {"_id": 0, "tasks": 1, "projects": 1}) or {}
+    return {"tasks": int(doc.get("tasks", 0) or 0), "projects": doc.get("projects") or {}}
+
+
+def add_archived_rollups(rollups: dict, archived: dict) -> dict:
+    """Add archived task counts to {project_id: {"tasks_total", "tasks_done", "focus_minutes"}} in place."""
+    for pid, counts in archived["projects"].items():
+        row = rollups.setdefault(pid, {"tasks_total": 0, "tasks_done": 0, "focus_minutes": 0})
+        row["tasks_total"] += counts.get("tasks", 0)
+        row["tasks_done"] += counts.get("tasks", 0)
+        row["focus_minutes"] += counts.get("focus_minutes", 0)
+    return rollups
+
+
+def _count_archived(docs: list[dict], sign: int, batch: str | None = None):
+    """$inc the per-user / per-project counters for tasks entering (+1) or leaving (-1) the archive.
+
+    With `batch`, a user's counters take each batch at most once (replaying a journal is safe).
+    """
+    per_user: dict[str, list[dict]] = {}
+    for d in docs:
+        per_user.setdefault(d["user_id"], []).append(d)
+
+    ops = []
+    for user_id, user_docs in per_user.items():
+        focus = focus_by_task(user_id, [str(d["_id"]) for d in user_docs])
+        inc = {"tasks": sign * len(user_docs)}
+        for d in user_docs:
+            pid = d.get("project_id")
+            if not pid:
+                continue
+            inc[f"projects.{pid}.tasks"] = inc.get(f"projects.{pid}.tasks", 0) + sign
+            minutes = focus.get(str(d["_id"]), {}).get("minutes", 0)
+            inc[f"projects.{pid}.focus_minutes"] = inc.get(f"projects.{pid}.focus_minutes", 0) + sign * minutes
+        if batch is None:
+            ops.append(UpdateOne({"user_id": user_id}, {"$inc": inc, "$setOnInsert": {"user_id": user_id}}, upsert=True))
+        else:
+            # already counted: no match, and the upsert hits the unique user_id index
+            ops.append(
+                UpdateOne(
+                    {"user_id": user_id, "batches": {"$ne": batch}},
+                    {"$inc": inc, "$addToSet": {"batches": batch}, "$setOnInsert": {"user_id": user_id}},
+                    upsert=True,
+                )
+            )
+    if ops:
+        try:
+            current_app.archive_stats.bulk_write(ops, ordered=False)
+        except BulkWriteError as exc:
+            if batch is None or any(e.get("code") != _DUPLICATE_KEY for e in exc.details.get("writeErrors", [])):
+                raise
+
+
+def rebuild_archive_stats(user_id: str | None = None) -> dict:
+    """Recompute archive counters from tasks_archive (repair after an interrupted run)."""
+    match = {"user_id": user_id} if user_id else {}
+    current_app.archive_stats.delete_many(match)
+    docs = []
+    for doc in current_app.tasks_archive.find(match, {"user_id": 1, "project_id": 1}).batch_size(BATCH_SIZE):
+        docs.append(doc)
+        if len(docs) >= BATCH_SIZE:
+            _count_archived(docs, 1)
+            docs = []
+    _count_archived(docs, 1)
+    return {"users": len(current_app.archive_stats.distinct("user_id", match))}
+
+
+# -----------------------
+#  Moving documents
+# -----------------------
+def _as_read(doc: dict, guard: dict) -> dict:
+    """Filter that only matches `doc` while every field read is unchanged (and `guard` holds)."""
+    return {**{k: v for k, v in doc.items() if k != "archived_at"}, **guard}
+
+
+def _take_back(source: str, ids: list) -> set:
+    """Drop the archive copies of `ids` that are still live; returns those ids."""
+    kept = {d["_id"] for d in _collection(source).find({"_id": {"$in": ids}}, {"_id": 1})}
+    if kept:
+        # changed after it was read (e.g. reopened or edited): it stays live
+        _collection(ARCHIVES[source]).delete_many({"_id": {"$in": list(kept)}})
+    return kept
+
+
+def _move_batch(source: str, docs: list[dict], guard: dict) -> list[dict]:
+    """Copy `docs` to the archive and delete them from `source` if unchanged since read and `guard` holds.
+
+    Returns the documents that actually moved.
+    """
+    try:
+        _collection(ARCHIVES[source]).insert_many(docs, ordered=False)
+    except BulkWriteError as exc:
+        # copies left by an interrupted run are fine; anything else is not
+        if any(e.get("code") != _DUPLICATE_KEY for e in exc.details.get("writeErrors", [])):
+            raise
+
+    _collection(source).bulk_write([DeleteOne(_as_read(d, guard)) for d in docs], ordered=False)
+    kept = _take_back(source, [d["_id"] for d in docs])
+    return [d for d in docs if d["_id"] not in kept]
+
+
+# -----------------------
+#  Task batch journal
+# -----------------------
+def _journal_batch(docs: list[dict]) -> str:
+    batch = f"{JOURNAL_PREFIX}{uuid.uuid4().hex}"
+    current_app.migration_progress.insert_one(
+        {
+            "_id": batch,
+            "created_at": datetime.utcnow(),
+            "docs": [{"_id": d["_id"], "user_id": d["user_id"], "project_id": d.get("project_id")} for d in docs],
+        }
+    )
+    return batch
+
+
+def _close_batch(batch: str, docs: list[dict]):
+    """Count the moved `docs` (once per user and batch) and drop the journal entry."""
+    _count_archived(docs, 1, batch=batch)
+    current_app.migration_progress.delete_one({"_id": batch})
+    current_app.archive_stats.update_many({"batches": batch}, {"$pull": {"batches": batch}})
+
+
+def replay_archive_journal() -> set:
+    """Finish task batches an interrupted run left journaled; returns the users they touched."""
+    users = set()
+    for journal in list(current_app.migration_progress.find({"_id": {"$regex": f"^{JOURNAL_PREFIX}"}})):
+        docs = journal.get("docs") or []
+        ids = [d["_id"] for d in docs]
+        kept = _take_back("tasks", ids)
+        archived = {d["_id"] for d in current_app.tasks_archive.find({"_id": {"$in": ids}}, {"_id": 1})}
+        _close_batch(journal["_id"], [d for d in docs if d["_id"] in archived and d["_id"] not in kept])
+        users.update(d["user_id"] for d in docs)
+    return users
+
+
+def _archive(source: str, query: dict, guard: dict, batch_size: int, max_batches: int | None) -> tuple[int, set]:
+    moved, users, batches = 0, set(), 0
+    while max_batches is None or batches < max_batches:
+        docs = list(_collection(source).find(query).limit(batch_size))
+        if not docs:
+            break
+        now = datetime.utcnow()
+        for d in docs:
+            d["archived_at"] = now
+        batch = _journal_batch(docs) if source == "tasks" else None
+        done = _move_batch(source, docs, guard)
+        if batch:
+            _close_batch(batch, done)
+        if not done:
+            break
+        moved += len(done)
+        users.update(d["user_id"] for d in done)
+        batches += 1
+    return moved, users
+
+
+def archive_completed_tasks(days: int, batch_size: int = BATCH_SIZE, max_batches: int | None = None) -> dict:
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    query = {"completed": True, "completed_at": {"$lt": cutoff}}
+    replayed = replay_archive_journal()
+    moved, users = _archive("tasks", query, {"completed": True}, batch_size, max_batches)
+    return {"tasks": moved, "users": users | replayed}
+
+
+def archive_old_sessions(days: int, batch_size: int = BATCH_SIZE, max_batches: int | None = None) -> dict:
+    # Queued sessions can arrive up to MAX_BACKDATE late; their client ids must still be in
+    # the live collection's unique index to be recognised as duplicates.
+    days = max(days, MAX_BACKDATE.days + 1)
+    query = {"created_at": {"$lt": datetime.utcnow() - timedelta(days=days)}}
+    report, users = {}, set()
+    for source in ("focus_sessions", "break_sessions"):
+        report[source], moved_users = _archive(source, query, {}, batch_size, max_batches)
+        users |= moved_users
+    return {**report, "users": users}
+
+
+def apply_audit_retention(days: int):
+    """Create / retune / drop the TTL index that expires audit logs after `days` (0 keeps them)."""
+    col = current_app.audit_logs
+    info = col.index_information().get("created_at_ttl")
+    if days <= 0:
+        if info:
+            col.drop_index("created_at_ttl")
+        return
+    seconds = int(timedelta(days=days).total_seconds())
+    if info is None:
+        col.create_index([("created_at", 1)], name="created_at_ttl", expireAfterSeconds=seconds)
+    elif info.get("expireAfterSeconds") != seconds:
+        current_app.db.command(
+            "collMod", "audit_logs", index={"keyPattern": {"created_at": 1}, "expireAfterSeconds": seconds}
+        )
+
+
+def _acquire_lease(owner: str) -> bool:
+    """One archiver at a time across workers; an expired lease can be taken over."""
+    now = datetime.utcnow()
+    try:
+        current_app.migration_progress.find_one_and_update(
+            {"_id": LEASE_ID, "$or": [{"expires_at": {"$lt": now}}, {"owner": owner}]},
+            {"$set": {"owner": owner, "expires_at": now + LEASE_TTL}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        return False
+    return True
+
+
+def _release_lease(owner: str):
+    current_app.migration_progress.update_one(
+        {"_id": LEASE_ID, "owner": owner}, {"$set": {"expires_at": datetime.utcnow()}}
+    )
+
+
+def run_archive(batch_size: int = BATCH_SIZE, max_batches: int | None = None) -> dict | None:
+    """One archive pass using the app's retention settings; None if another worker holds the lease."""
+    owner = uuid.uuid4().hex
+    if not _acquire_lease(owner):
+        return None
+    config = current_app.config
+    try:
+        tasks = archive_completed_tasks(config["ARCHIVE_TASKS_AFTER_DAYS"], batch_size, max_batches)
+        sessions = archive_old_sessions(config["ARCHIVE_SESSIONS_AFTER_DAYS"], batch_size, max_batches)
+        apply_audit_retention(config["AUDIT_RETENTION_DAYS"])
+    finally:
+        _release_lease(owner)
+
+    # cached pages / insights of affected users are stale now
+    for user_id in tasks["users"] | sessions["users"]:
+        bump_data_version(user_id)
+    return {
+        "tasks": tasks["tasks"],
+        "focus_sessions": sessions["focus_sessions"],
+        "break_sessions": sessions["break_sessions"],
+        "users": len(tasks["users"] | sessions["users"]),
+    }
+
+
+def start_background_archiver(app, interval: float) -> threading.Thread:
+    """Run an archive pass every `interval` seconds on a daemon thread."""
+
+    def _run():
+        while True:
+            with app.app_context():
+                try:
+                    report = run_archive()
+                    if report:
+                        log.info("Archived %s", report)
+                except PyMongoError:
+                    log.exception("Archive pass failed")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=_run, name="archiver", daemon=True)
+    thread.start()
+    return thread
+
+
+# -----------------------
+#  Restore
+# -----------------------
+def restore_task(user_id: str, task_id: str) -> bool:
+    """Move one archived task back to the live collection (still completed)."""
+    try:
+        oid = ObjectId(task_id)
+    except (InvalidId, TypeError):
+        return False
+    doc = current_app.tasks_archive.find_one({"_id": oid, "user_id": user_id})
+    if not doc:
+        return False
+
+    doc.pop("archived_at", None)
+    # restarts the clock so the next pass does not archive it again right away
+    doc["completed_at"] = datetime.utcnow()
+    try:
+        current_app.tasks.insert_one(doc)
+    except DuplicateKeyError:
+        pass
+    # only the request that removes the archive copy adjusts the counters
+    if current_app.tasks_archive.delete_one({"_id": oid, "user_id": user_id}).deleted_count:
+        _count_archived([doc], -1)
+        bump_data_version(user_id)
+        audit(user_id, "RESTORE_TASK", {"task_id": task_id})
+    return True
@@ -0,0 +1,48 @@
+"""Data export.
+
+Each export walks one of the user's collections in ``_id`` order with a
+projection and a bounded cursor batch size, so the server holds at most one
+batch at a time however long the history is. Consumers resume an interrupted
+export by passing the last ``_id`` they received as ``after``.
+
+Tasks and sessions that were moved to the archive tier are merged back in by
+``_id``, so an export still covers the full history.
+"""
+
+from __future__ import annotations
+
+import heapq
+
+from bson import ObjectId
+from flask import current_app
+
+from model.archive_model import ARCHIVES
+
+BATCH_SIZE = 500
+
+# kind -> (collection, exported fields in CSV column order)
+EXPORTS = {
+    "tasks": (
+        "tasks",
+        ["_id", "title", "description", "due_date", "importance", "complexity", "energy", "completed", "project_id", "tags"],
+    ),
+    "projects": ("projects", ["_id", "name", "created_at"]),
+    "focus-sessions": ("focus_sessions", ["_id", "created_at", "minutes", "task_id"]),
+    "break-sessions": ("break_sessions", ["_id", "created_at", "minutes", "mode"]),
+    "audit-logs": ("audit_logs", ["_id", "created_at", "action", "payload"]),
+}
+
+
+def export_cursor(user_id: str, kind: str, after: ObjectId | None = None):
+    """Lazy iterator over the user's `kind` documents after `after`, oldest first."""
+    collection, fields = EXPORTS[kind]
+    query = {"user_id": user_id}
+    if after is not None:
+        query["_id"] = {"$gt": after}
+
+    def cursor(name: str):
+        return current_app.db[name].find(query, {f: 1 for f in fields}).sort("_id", 1).batch_size(BATCH_SIZE)
+
+    if collection not in ARCHIVES:
+        return cursor(collection)
+    return heapq.merge(cursor(collection), cursor(ARCHIVES[collection]), key=lambda d: d["_id"])
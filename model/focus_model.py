@@ -0,0 +1,174 @@
+"""Focus rollups.
+
+One document per (user, task) holding the running totals of the user's focus
+sessions for that task. Sessions without a task are rolled up under
+``task_id: None`` so overall totals can be read from rollups as well.
+
+Rollups are maintained with ``$inc`` when a session is logged, so pages read a
+handful of small documents instead of re-summing the whole session history.
+``rebuild_focus_rollups()`` recomputes them from raw sessions when needed.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+
+from bson import ObjectId
+from flask import current_app
+from pymongo import DeleteOne, InsertOne, ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+# Extra passes over a user whose guarded writes lost to a concurrent session.
+RETRY_PASSES = 3
+
+
+def _rollup_update(
+    user_id: str, task_id: str | None, minutes: int, sessions: int, last_at: datetime, first_id: ObjectId | None = None
+) -> dict:
+    update = {
+        "$inc": {"minutes": int(minutes), "sessions": sessions},
+        "$max": {"last_session_at": last_at},
+        "$setOnInsert": {"user_id": user_id, "task_id": task_id},
+    }
+    if first_id is not None:
+        # the task's earliest session: insights break ties between tasks in first-seen order
+        update["$min"] = {"first_session_id": first_id}
+    return update
+
+
+def record_focus_sessions(user_id: str, sessions: list[dict]):
+    """Add many stored session docs (with their ``_id``) to their rollups: one upsert per task, one bulk_write."""
+    per_task: dict[str | None, list] = {}
+    for s in sessions:
+        acc = per_task.setdefault(s.get("task_id"), [0, 0, s["created_at"], s["_id"]])
+        acc[0] += int(s.get("minutes", 0) or 0)
+        acc[1] += 1
+        acc[2] = max(acc[2], s["created_at"])
+        acc[3] = min(acc[3], s["_id"])
+    ops = [
+        UpdateOne(
+            {"user_id": user_id, "task_id": tid},
+            _rollup_update(user_id, tid, mins, cnt, last, first_id),
+            upsert=True,
+        )
+        for tid, (mins, cnt, last, first_id) in per_task.items()
+    ]
+    if ops:
+        current_app.focus_rollups.bulk_write(ops, ordered=False)
+
+
+def focus_by_task(user_id: str, task_ids: list[str] | None = None) -> dict:
+    """Return {task_id: {"minutes", "sessions", "last_session_at"}} for linked sessions.
+
+    Pass ``task_ids`` to only read the rollups of those tasks.
+    """
+    query = {"user_id": user_id}
+    if task_ids is not None:
+        query["task_id"] = {"$in": list(task_ids)}
+    else:
+        query["task_id"] = {"$ne": None}
+
+    out = {}
+    for d in current_app.focus_rollups.find(query, {"_id": 0, "task_id": 1, "minutes": 1, "sessions": 1, "last_session_at": 1}):
+        out[d["task_id"]] = {
+            "minutes": int(d.get("minutes", 0) or 0),
+            "sessions": int(d.get("sessions", 0) or 0),
+            "last_session_at": d.get("last_session_at"),
+        }
+    return out
+
+
+# -----------------------
+#  Repair
+# -----------------------
+def _as_read(doc: dict) -> dict:
+    """Filter that only matches the rollup while no ``$inc`` has landed on it since it was read."""
+    return {"_id": doc["_id"], "minutes": doc.get("minutes"), "sessions": doc.get("sessions")}
+
+
+def _rebuild_user(user_id: str, apply: bool) -> dict:
+    # Read the rollups before the sessions: a session logged in between changes
+    # its rollup, so the guarded write below skips it.
+    existing = {d.get("task_id") or None: d for d in current_app.focus_rollups.find({"user_id": user_id})}
+    pipeline = [
+        {"$match": {"user_id": user_id}},
+        # archived sessions still count (see model/archive_model.py)
+        {"$unionWith": {"coll": "focus_sessions_archive", "pipeline": [{"$match": {"user_id": user_id}}]}},
+        {
+            "$group": {
+                "_id": {"$ifNull": ["$task_id", None]},
+                "minutes": {"$sum": "$minutes"},
+                "sessions": {"$sum": 1},
+                "last_session_at": {"$max": "$created_at"},
+                "first_session_id": {"$min": "$_id"},
+            }
+        },
+    ]
+    expected = {d["_id"] or None: d for d in current_app.focus_sessions.aggregate(pipeline)}
+
+    report = {"missing": 0, "stale": 0, "orphaned": 0, "skipped": 0}
+    ops = []
+
+    for tid, exp in expected.items():
+        doc = {
+            "user_id": user_id,
+            "task_id": tid,
+            "minutes": int(exp.get("minutes", 0) or 0),
+            "sessions": int(exp.get("sessions", 0) or 0),
+            "last_session_at": exp.get("last_session_at"),
+            "first_session_id": exp.get("first_session_id"),
+        }
+        cur = existing.get(tid)
+        if cur is None:
+            report["missing"] += 1
+            # (user_id, task_id) is unique, so this loses to a concurrent rollup upsert
+            ops.append(InsertOne(doc))
+        elif (cur.get("minutes"), cur.get("sessions")) != (doc["minutes"], doc["sessions"]):
+            report["stale"] += 1
+            ops.append(ReplaceOne(_as_read(cur), doc))
+
+    for tid, cur in existing.items():
+        if tid not in expected:
+            report["orphaned"] += 1
+            ops.append(DeleteOne(_as_read(cur)))
+
+    if apply and ops:
+        try:
+            result = current_app.focus_rollups.bulk_write(ops, ordered=False).bulk_api_result
+        except BulkWriteError as e:
+            result = e.details
+        report["skipped"] = len(ops) - result["nInserted"] - result["nMatched"] - result["nRemoved"]
+    return report
+
+
+def rebuild_focus_rollups(user_id: str | None = None, apply: bool = True) -> dict:
+    """Recompute rollups from raw focus sessions (live and archived) and report drift.
+
+    Works one user at a time so memory stays proportional to a single user's
+    task count. With ``apply=False`` only the drift report is produced.
+    Writes are guarded on the totals read, so a rollup that a new session
+    ``$inc``s meanwhile is skipped and the user is retried (up to
+    ``RETRY_PASSES`` times).
+    """
+    if user_id:
+        user_ids = [user_id]
+    else:
+        user_ids = set(current_app.focus_sessions.distinct("user_id"))
+        user_ids |= set(current_app.focus_sessions_archive.distinct("user_id"))
+        user_ids |= set(current_app.focus_rollups.distinct("user_id"))
+
+    report = {"users": 0, "users_with_drift": 0, "missing": 0, "stale": 0, "orphaned": 0, "skipped": 0}
+    for uid in user_ids:
+        r = _rebuild_user(uid, apply)
+        report["users"] += 1
+        if any(r.values()):
+            report["users_with_drift"] += 1
+        for k, v in r.items():
+            report[k] += v
+        for _ in range(RETRY_PASSES):
+            if not r["skipped"]:
+                break
+            report["skipped"] -= r["skipped"]
+            r = _rebuild_user(uid, apply)
+            report["skipped"] += r["skipped"]
+    return report
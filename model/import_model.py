@@ -0,0 +1,220 @@
+"""Bulk task import.
+
+Rows are parsed one at a time from a CSV or NDJSON byte stream, validated
+with the same field rules as ``/addtask`` and written with
+``insert_many(ordered=False)`` in fixed-size batches. Only the current batch
+and a capped error list are held in memory, so the row count is unbounded.
+
+Columns / keys: ``title`` (required), ``description``, ``due_date``
+(YYYY-MM-DD), ``importance`` (Low/Medium/High), ``complexity``, ``energy``
+(1-5), ``completed``, ``project`` (name, created if missing) or
+``project_id``, and ``tags`` (comma or semicolon separated, or a JSON list).
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import re
+from datetime import datetime
+from typing import IO, Iterator
+
+from flask import current_app
+from pymongo.errors import BulkWriteError
+
+from model.priority_model import score_new_task
+from model.tag_model import record_tag_deltas
+from model.task_schema import SCHEMA_VERSION, importance_rank, normalize_task_fields, parse_due
+from utils.audit import audit
+from utils.cache import bump_data_version
+
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+FORMATS = ("csv", "ndjson")
+
+_TAG_SPLIT = re.compile(r"[,;]")
+_TRUE = {"1", "true", "yes", "y", "done"}
+
+
+def iter_rows(stream: IO[bytes], fmt: str) -> Iterator[tuple[int, dict | None]]:
+    """Yield (row number, row dict or None if unparseable), reading incrementally."""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        number = 0
+        while True:
+            number += 1
+            try:
+                row = next(reader)
+            except StopIteration:
+                return
+            except csv.Error:
+                row = None
+            yield number, row
+
+    number = 0
+    for line in text:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield number, row if isinstance(row, dict) else None
+
+
+def _text(row: dict, key: str) -> str:
+    value = row.get(key)
+    return "" if value is None else str(value).strip()
+
+
+def _tags(value) -> list[str]:
+    if isinstance(value, list):
+        names = [str(v) for v in value]
+    else:
+        names = _TAG_SPLIT.split(value or "")
+    return list(dict.fromkeys(n.strip() for n in names if n and n.strip()))
+
+
+def _due(value):
+    """None for an empty value, a date for valid input, False if unparseable."""
+    if value in (None, ""):
+        return None
+    due = parse_due(value)
+    if due is None and isinstance(value, str):
+        try:
+            due = parse_due(datetime.fromisoformat(value.strip()))
+        except ValueError:
+            pass
+    return due if due is not None else False
+
+
+class _ProjectResolver:
+    """Maps project names / ids to the user's project ids, creating missing names once."""
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.by_name: dict[str, str] = {}
+        self.ids: set[str] = set()
+        for p in current_app.projects.find({"user_id": user_id}, {"name": 1}):
+            self.by_name.setdefault(p.get("name", "").strip().lower(), str(p["_id"]))
+            self.ids.add(str(p["_id"]))
+        self.created = 0
+
+    def resolve(self, row: dict):
+        """Return a project id, None for no project, or False for an unknown project_id."""
+        pid = _text(row, "project_id")
+        if pid:
+            return pid if pid in self.ids else False
+        name = _text(row, "project")
+        if not name:
+            return None
+        key = name.lower()
+        if key not in self.by_name:
+            result = current_app.projects.insert_one(
+                {"user_id": self.user_id, "name": name, "created_at": datetime.utcnow()}
+            )
+            self.by_name[key] = str(result.inserted_id)
+            self.ids.add(self.by_name[key])
+            self.created += 1
+        return self.by_name[key]
+
+
+def task_from_row(user_id: str, row: dict, projects: _ProjectResolver) -> dict:
+    """Build a task document from one import row; ValueError(code) if it is invalid."""
+    title = _text(row, "title")
+    if not title:
+        raise ValueError("missing_title")
+
+    importance = _text(row, "importance") or "Low"
+    if importance not in importance_rank:
+        raise ValueError("invalid_importance")
+
+    fields = {"title": title, "description": _text(row, "description"), "importance": importance}
+    for key in ("complexity", "energy"):
+        raw = _text(row, key) or "1"
+        try:
+            fields[key] = int(raw)
+        except ValueError:
+            raise ValueError(f"invalid_{key}") from None
+
+    due = _due(row.get("due_date"))
+    if due is False:
+        raise ValueError("invalid_due_date")
+    fields["due_date"] = due
+
+    project_id = projects.resolve(row)
+    if project_id is False:
+        raise ValueError("invalid_project")
+    fields["project_id"] = project_id
+
+    fields["tags"] = _tags(row.get("tags"))
+    completed = row.get("completed")
+    fields["completed"] = completed if isinstance(completed, bool) else _text(row, "completed").lower() in _TRUE
+
+    doc = {**normalize_task_fields(fields), "user_id": user_id, "schema_version": SCHEMA_VERSION}
+    if doc["completed"]:
+        doc["completed_at"] = datetime.utcnow()
+    doc["priority"] = score_new_task(doc)
+    return doc
+
+
+def import_tasks(user_id: str, stream: IO[bytes], fmt: str, batch_size: int = BATCH_SIZE) -> dict:
+    """Import tasks from `stream`; returns counts and a per-row error report (capped)."""
+    projects = _ProjectResolver(user_id)
+    report = {"rows": 0, "imported": 0, "failed": 0, "errors": [], "errors_truncated": False}
+
+    def error(row_number: int, code: str):
+        report["failed"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"row": row_number, "error": code})
+        else:
+            report["errors_truncated"] = True
+
+    def flush(batch: list[tuple[int, dict]]):
+        if not batch:
+            return
+        failed = {}
+        try:
+            current_app.tasks.insert_many([doc for _, doc in batch], ordered=False)
+        except BulkWriteError as exc:
+            failed = {e["index"]: e.get("code") for e in exc.details.get("writeErrors", [])}
+
+        deltas: dict[str, int] = {}
+        for index, (row_number, doc) in enumerate(batch):
+            if index in failed:
+                error(row_number, "write_failed")
+                continue
+            report["imported"] += 1
+            for tag in doc.get("tags") or []:
+                deltas[tag] = deltas.get(tag, 0) + 1
+        # registers new tags and bumps usage counts in one bulk_write per batch
+        record_tag_deltas(user_id, deltas)
+
+    batch: list[tuple[int, dict]] = []
+    try:
+        for row_number, row in iter_rows(stream, fmt):
+            report["rows"] += 1
+            if row is None:
+                error(row_number, "unparseable_row")
+                continue
+            try:
+                batch.append((row_number, task_from_row(user_id, row, projects)))
+            except ValueError as exc:
+                error(row_number, str(exc))
+                continue
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+    except UnicodeDecodeError:
+        # rows before the bad bytes are kept; the rest of the file is skipped
+        error(report["rows"] + 1, "invalid_encoding")
+    flush(batch)
+
+    report["projects_created"] = projects.created
+    if report["imported"] or projects.created:
+        bump_data_version(user_id)
+        audit(user_id, "IMPORT_TASKS", {"imported": report["imported"], "failed": report["failed"]})
+    return report
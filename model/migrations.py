@@ -0,0 +1,396 @@
+"""Versioned index / schema migrations.
+
+Every migration has an integer version and is applied at most once per
+database. Applied versions are recorded in the ``migrations`` collection, so
+restarting the app (or running ``flask migrate`` by hand) only executes what
+is new.
+
+Index builds on MongoDB 4.2+ do not hold an exclusive lock for the whole
+build, and ``start_background_migrations()`` runs them on a daemon thread, so
+the app can serve requests while a large collection is being indexed.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from datetime import datetime
+from typing import Callable
+
+from flask import current_app
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+log = logging.getLogger(__name__)
+
+MIGRATIONS: list[tuple[int, str, Callable[[], None]]] = []
+
+
+def migration(version: int, description: str):
+    """Register a migration function under a unique version number."""
+
+    def decorator(fn):
+        if any(v == version for v, _, _ in MIGRATIONS):
+            raise ValueError(f"Duplicate migration version {version}")
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+
+    return decorator
+
+
+def _create_indexes(collection_name: str, specs: list[dict]):
+    """Create indexes from simple dict specs: {"keys": [...], **options}."""
+    col = current_app.db[collection_name]
+    for spec in specs:
+        spec = dict(spec)
+        keys = spec.pop("keys")
+        col.create_index(keys, **spec)
+
+
+def _drop_indexes(collection_name: str, names: list[str]):
+    """Drop indexes by name; ones that do not exist (fresh or already migrated databases) are skipped."""
+    col = current_app.db[collection_name]
+    existing = col.index_information()
+    for name in names:
+        if name in existing:
+            col.drop_index(name)
+
+
+# -----------------------
+#  Migrations
+# -----------------------
+@migration(1, "Initial indexes matching the app's query shapes")
+def _m001_initial_indexes():
+    _create_indexes(
+        "users",
+        [{"keys": [("email", ASCENDING)], "name": "email_unique", "unique": True}],
+    )
+    _create_indexes(
+        "tasks",
+        [
+            {"keys": [("user_id", ASCENDING), ("project_id", ASCENDING)], "name": "user_project"},
+            {"keys": [("user_id", ASCENDING), ("completed", ASCENDING)], "name": "user_completed"},
+        ],
+    )
+    _create_indexes(
+        "focus_sessions",
+        [
+            {"keys": [("user_id", ASCENDING), ("created_at", DESCENDING)], "name": "user_created"},
+            {"keys": [("user_id", ASCENDING), ("task_id", ASCENDING)], "name": "user_task"},
+        ],
+    )
+    _create_indexes(
+        "break_sessions",
+        [{"keys": [("user_id", ASCENDING), ("created_at", DESCENDING)], "name": "user_created"}],
+    )
+    _create_indexes(
+        "projects",
+        [{"keys": [("user_id", ASCENDING), ("name", ASCENDING)], "name": "user_name"}],
+    )
+    _create_indexes(
+        "tags",
+        [{"keys": [("user_id", ASCENDING), ("name", ASCENDING)], "name": "user_name_unique", "unique": True}],
+    )
+    _create_indexes(
+        "settings",
+        [{"keys": [("user_id", ASCENDING)], "name": "user_unique", "unique": True}],
+    )
+    _create_indexes(
+        "moods",
+        [{"keys": [("user_id", ASCENDING), ("created_at", DESCENDING)], "name": "user_created"}],
+    )
+    _create_indexes(
+        "audit_logs",
+        [{"keys": [("user_id", ASCENDING), ("created_at", DESCENDING)], "name": "user_created"}],
+    )
+
+
+@migration(2, "Focus rollups keyed by user and task")
+def _m002_focus_rollups():
+    _create_indexes(
+        "focus_rollups",
+        [{"keys": [("user_id", ASCENDING), ("task_id", ASCENDING)], "name": "user_task_unique", "unique": True}],
+    )
+
+
+@migration(3, "Numeric importance rank and index-backed task sorts")
+def _m003_task_sort_indexes():
+    tasks = current_app.tasks
+    for name, rank in (("Low", 1), ("Medium", 2), ("High", 3)):
+        tasks.update_many({"importance": name, "importance_rank": {"$exists": False}}, {"$set": {"importance_rank": rank}})
+    tasks.update_many({"importance": {"$exists": False}, "importance_rank": {"$exists": False}}, {"$set": {"importance_rank": 1}})
+    tasks.update_many({"importance_rank": {"$exists": False}}, {"$set": {"importance_rank": 0}})
+    # Keyset pagination compares sort keys, so they must be present on every document.
+    tasks.update_many({"due_date": {"$exists": False}}, {"$set": {"due_date": ""}})
+    tasks.update_many({"complexity": {"$exists": False}}, {"$set": {"complexity": 1}})
+    tasks.update_many({"energy": {"$exists": False}}, {"$set": {"energy": 1}})
+
+    _create_indexes(
+        "tasks",
+        [
+            {"keys": [("user_id", ASCENDING), ("due_date", ASCENDING), ("_id", ASCENDING)], "name": "user_due"},
+            {
+                "keys": [("user_id", ASCENDING), ("project_id", ASCENDING), ("due_date", ASCENDING), ("_id", ASCENDING)],
+                "name": "user_project_due",
+            },
+            {
+                "keys": [
+                    ("user_id", ASCENDING),
+                    ("importance_rank", ASCENDING),
+                    ("complexity", ASCENDING),
+                    ("_id", ASCENDING),
+                ],
+                "name": "user_importance",
+            },
+            {"keys": [("user_id", ASCENDING), ("complexity", ASCENDING), ("_id", ASCENDING)], "name": "user_complexity"},
+            {"keys": [("user_id", ASCENDING), ("energy", ASCENDING), ("_id", ASCENDING)], "name": "user_energy"},
+        ],
+    )
+
+
+@migration(4, "Due-date range index for dashboard buckets")
+def _m004_due_buckets_index():
+    _create_indexes(
+        "tasks",
+        [
+            {
+                "keys": [("user_id", ASCENDING), ("completed", ASCENDING), ("due_date", ASCENDING), ("_id", ASCENDING)],
+                "name": "user_open_due",
+            }
+        ],
+    )
+
+
+@migration(5, "Default tags for existing users and tag usage counts")
+def _m005_tag_usage():
+    from model.tag_model import DEFAULT_TAGS
+
+    now = datetime.utcnow()
+    ops = []
+
+    def flush():
+        if ops:
+            current_app.tags.bulk_write(ops, ordered=False)
+            ops.clear()
+
+    for user in current_app.users.find({}, {"_id": 1}):
+        uid = str(user["_id"])
+        for name in DEFAULT_TAGS:
+            ops.append(
+                UpdateOne(
+                    {"user_id": uid, "name": name},
+                    {"$setOnInsert": {"user_id": uid, "name": name, "created_at": now}},
+                    upsert=True,
+                )
+            )
+        if len(ops) >= 1000:
+            flush()
+    flush()
+
+    # usage_count = number of tasks carrying the tag; tags used on tasks get registered too
+    current_app.tags.update_many({}, {"$set": {"usage_count": 0}})
+    usage = current_app.tasks.aggregate(
+        [
+            {"$match": {"tags.0": {"$exists": True}}},
+            {"$unwind": "$tags"},
+            {"$group": {"_id": {"user_id": "$user_id", "name": "$tags"}, "count": {"$sum": 1}}},
+        ]
+    )
+    for row in usage:
+        uid, name = row["_id"]["user_id"], row["_id"]["name"]
+        ops.append(
+            UpdateOne(
+                {"user_id": uid, "name": name},
+                {"$set": {"usage_count": row["count"]}, "$setOnInsert": {"user_id": uid, "name": name, "created_at": now}},
+                upsert=True,
+            )
+        )
+        if len(ops) >= 1000:
+            flush()
+    flush()
+
+
+@migration(6, "Idempotency keys for focus / break sessions")
+def _m006_session_client_ids():
+    # Only sessions sent with a client id are deduplicated; older documents have none.
+    spec = {
+        "keys": [("user_id", ASCENDING), ("client_id", ASCENDING)],
+        "name": "user_client_id_unique",
+        "unique": True,
+        "partialFilterExpression": {"client_id": {"$type": "string"}},
+    }
+    _create_indexes("focus_sessions", [spec])
+    _create_indexes("break_sessions", [spec])
+
+
+@migration(7, "Daily activity stats backfilled from sessions")
+def _m007_daily_stats():
+    from model.stats_model import rebuild_daily_stats
+
+    _create_indexes(
+        "daily_stats",
+        [{"keys": [("user_id", ASCENDING), ("day", ASCENDING)], "name": "user_day_unique", "unique": True}],
+    )
+    rebuild_daily_stats(include_today=True)
+
+
+@migration(8, "Per-user _id indexes for streaming exports")
+def _m008_export_indexes():
+    for name in ("tasks", "projects", "focus_sessions", "break_sessions", "audit_logs"):
+        _create_indexes(name, [{"keys": [("user_id", ASCENDING), ("_id", ASCENDING)], "name": "user_id_order"}])
+
+
+@migration(9, "Archive tier: completion times, archive indexes and audit log TTL")
+def _m009_archive_tier():
+    from model.archive_model import apply_audit_retention
+
+    # Tasks completed before completion times were recorded count from their creation.
+    current_app.tasks.update_many(
+        {"completed": True, "completed_at": {"$exists": False}},
+        [{"$set": {"completed_at": {"$toDate": "$_id"}}}],
+    )
+    _create_indexes(
+        "tasks",
+        [
+            {
+                "keys": [("completed_at", ASCENDING)],
+                "name": "completed_at_archive",
+                "partialFilterExpression": {"completed": True},
+            }
+        ],
+    )
+    for name in ("focus_sessions", "break_sessions"):
+        _create_indexes(name, [{"keys": [("created_at", ASCENDING)], "name": "created_archive"}])
+
+    # Archives are read per user: export / rebuilds in _id order, the task list's
+    # "include archived" view by project.
+    for name in ("tasks_archive", "focus_sessions_archive", "break_sessions_archive"):
+        _create_indexes(name, [{"keys": [("user_id", ASCENDING), ("_id", ASCENDING)], "name": "user_id_order"}])
+    _create_indexes(
+        "tasks_archive",
+        [{"keys": [("user_id", ASCENDING), ("project_id", ASCENDING)], "name": "user_project"}],
+    )
+    _create_indexes(
+        "archive_stats",
+        [{"keys": [("user_id", ASCENDING)], "name": "user_unique", "unique": True}],
+    )
+    apply_audit_retention(current_app.config["AUDIT_RETENTION_DAYS"])
+
+
+@migration(10, "Priority scores with one top-k index per dashboard list")
+def _m010_priority_scores():
+    from model.priority_model import PROFILES, rescore_all
+
+    _create_indexes(
+        "tasks",
+        [
+            {
+                "keys": [
+                    ("user_id", ASCENDING),
+                    ("completed", ASCENDING),
+                    (f"priority.{profile}", DESCENDING),
+                    ("_id", ASCENDING),
+                ],
+                "name": f"priority_{profile}",
+                # tasks outside a list (e.g. not urgent for quick wins) have no score there
+                "partialFilterExpression": {f"priority.{profile}": {"$exists": True}},
+            }
+            for profile in PROFILES
+        ],
+    )
+    rescore_all()
+
+
+@migration(11, "Focus rollups remember each task's first session")
+def _m011_rollup_first_session():
+    # $min is safe next to live ingestion, which only ever lowers the same field
+    ops = []
+    for name in ("focus_sessions", "focus_sessions_archive"):
+        rows = current_app.db[name].aggregate(
+            [
+                {"$match": {"task_id": {"$nin": [None, ""]}}},
+                {"$group": {"_id": {"user_id": "$user_id", "task_id": "$task_id"}, "first": {"$min": "$_id"}}},
+            ]
+        )
+        for row in rows:
+            ops.append(
+                UpdateOne(
+                    {"user_id": row["_id"]["user_id"], "task_id": row["_id"]["task_id"]},
+                    {"$min": {"first_session_id": row["first"]}},
+                )
+            )
+            if len(ops) >= 1000:
+                current_app.focus_rollups.bulk_write(ops, ordered=False)
+                ops = []
+    if ops:
+        current_app.focus_rollups.bulk_write(ops, ordered=False)
+
+
+@migration(12, "Drop task indexes no query needs any more")
+def _m012_drop_unused_task_indexes():
+    # user_completed / user_project are prefixes of user_open_due / user_project_due.
+    # user_energy backed the old energy sort; the dashboard lists read priority_* now.
+    # user_due, user_importance and user_complexity stay: the task list and the
+    # timer page still sort by due date, importance and complexity with them.
+    _drop_indexes("tasks", ["user_completed", "user_project", "user_energy"])
+
+
+# -----------------------
+#  Runner
+# -----------------------
+def applied_versions() -> set[int]:
+    return {d["_id"] for d in current_app.migrations.find({}, {"_id": 1})}
+
+
+def pending_migrations():
+    done = applied_versions()
+    return [m for m in MIGRATIONS if m[0] not in done]
+
+
+def run_migrations() -> list[int]:
+    """Apply every pending migration in version order.
+
+    Stops at the first failure (e.g. a unique index that existing duplicate
+    data violates) so later migrations never run on top of a broken one.
+    Returns the versions applied by this call.
+    """
+    applied = []
+    for version, description, fn in pending_migrations():
+        log.info("Applying migration %s: %s", version, description)
+        try:
+            fn()
+        except PyMongoError:
+            log.exception("Migration %s failed", version)
+            break
+
+        try:
+            current_app.migrations.insert_one(
+                {"_id": version, "description": description, "applied_at": datetime.utcnow()}
+            )
+        except DuplicateKeyError:
+            # Another worker finished the same migration first; migrations are idempotent.
+            pass
+        applied.append(version)
+    return applied
+
+
+def start_background_migrations(app) -> threading.Thread:
+    """Run pending migrations on a daemon thread so startup never blocks on index builds.
+
+    Once indexes are in place, stored tasks are upgraded to the current task
+    schema in batches (see model/task_schema.py).
+    """
+    from model.task_schema import migrate_task_schema
+
+    def _run():
+        with app.app_context():
+            try:
+                run_migrations()
+                migrate_task_schema()
+            except PyMongoError:
+                log.exception("Background migrations could not run")
+
+    thread = threading.Thread(target=_run, name="migrations", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,233 @@
+"""Task priority scores.
+
+Each open task stores one score per dashboard list under ``priority``:
+
+    priority: {"plan_focused": 6.2, "plan_calm": 5.9, ..., "big_rocks": 4.1}
+
+A score is a weighted sum of five factors, each scaled to 0..1:
+
+- ``urgency``: 1 when overdue, 0.9 due today down to 0.6 in three days, then
+  fading out over the following weeks; 0 without a due date
+- ``importance``: Low 0, Medium 0.5, High 1
+- ``complexity`` / ``energy``: 1..5 mapped to 0..1
+- ``neglect``: 1 with no focus time, halving with every 25 focus minutes
+
+Lists that only take some tasks (e.g. quick wins: urgent and simple) leave the
+score out for the others. Every profile has a partial index on
+``(user_id, completed, priority.<profile>)`` (migration 10), so a dashboard
+list is a ``limit(k)`` index scan. ``PRIORITY_WEIGHTS`` (JSON) overrides the
+weights, e.g. ``{"quick_wins": {"complexity": -3}}``.
+
+Scores are written with the task and after anything that changes their
+inputs (edits, reopening, focus sessions). Urgency changes with the date, so a
+user's open tasks are rescored on their first dashboard view of each day
+(``refresh_priorities()``) and ``flask rescore-tasks`` rescores everybody.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from datetime import date, datetime
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from flask import current_app
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+
+from model.focus_model import focus_by_task
+from model.task_buckets import Bucket
+from model.task_schema import parse_due
+from model.task_view import SOON_DAYS, TASK_PROJECTION, TaskView
+from utils.cache import bump_data_version
+
+FACTORS = ("urgency", "importance", "complexity", "energy", "neglect")
+MOODS = ("energetic", "focused", "calm", "creative")
+
+# The focus plan is tuned per mood; the other lists are mood independent.
+_PLAN = {"urgency": 6.0, "importance": 2.0, "neglect": 0.5}
+_MOOD = {
+    "energetic": {"complexity": 1.0},
+    "focused": {"importance": 3.0},
+    "calm": {"complexity": -1.0},
+    "creative": {"energy": -1.0},
+}
+DEFAULT_WEIGHTS = {
+    **{f"plan_{mood}": {**_PLAN, **extra} for mood, extra in _MOOD.items()},
+    "quick_wins": {"urgency": 3.0, "importance": 1.0, "complexity": -2.0},
+    "big_rocks": {"complexity": 4.0, "urgency": 1.0, "importance": 1.0},
+    "neglected_urgent": {"urgency": 3.0, "importance": 1.0},
+}
+PROFILES = tuple(DEFAULT_WEIGHTS)
+
+_IMPORTANCE = {"High": 1.0, "Medium": 0.5}
+NEGLECT_HALF_LIFE_MINUTES = 25
+
+
+def plan_profile(mood: str) -> str:
+    return f"plan_{mood if mood in MOODS else 'focused'}"
+
+
+def profile_weights() -> dict:
+    """Default weights with the app's PRIORITY_WEIGHTS overrides applied."""
+    overrides = current_app.config.get("PRIORITY_WEIGHTS") or {}
+    return {p: {**w, **overrides.get(p, {})} for p, w in DEFAULT_WEIGHTS.items()}
+
+
+def _weights_key(weights: dict) -> str:
+    return hashlib.sha1(json.dumps(weights, sort_keys=True).encode("utf-8")).hexdigest()[:8]
+
+
+# -----------------------
+#  Scoring
+# -----------------------
+def _urgency(days_left: int | None) -> float:
+    if days_left is None:
+        return 0.0
+    if days_left < 0:
+        return 1.0
+    if days_left <= SOON_DAYS:
+        return 0.9 - 0.1 * days_left
+    return max(0.0, 0.5 - days_left / 60)
+
+
+def score_fields(doc: dict, today: date, focus_minutes: int, weights: dict) -> dict:
+    """{profile: score} for a task document; profiles the task does not qualify for are left out."""
+    due = parse_due(doc.get("due_date"))
+    days_left = (due.date() - today).days if due else None
+    complexity = int(doc.get("complexity") or 1)
+    factors = {
+        "urgency": _urgency(days_left),
+        "importance": _IMPORTANCE.get(doc.get("importance"), 0.0),
+        "complexity": (complexity - 1) / 4,
+        "energy": (int(doc.get("energy") or 1) - 1) / 4,
+        "neglect": 0.5 ** (focus_minutes / NEGLECT_HALF_LIFE_MINUTES),
+    }
+    urgent = days_left is not None and days_left <= SOON_DAYS
+
+    out = {}
+    for profile, w in weights.items():
+        if profile == "quick_wins" and not (urgent and complexity <= 2):
+            continue
+        if profile == "neglected_urgent" and not (urgent and focus_minutes == 0):
+            continue
+        out[profile] = round(sum(w.get(f, 0.0) * factors[f] for f in FACTORS), 4)
+    return out
+
+
+def score_new_task(doc: dict) -> dict:
+    """Scores for a task that is about to be inserted (no focus time yet)."""
+    return score_fields(doc, datetime.utcnow().date(), 0, profile_weights())
+
+
+_SCORE_PROJECTION = {"due_date": 1, "importance": 1, "complexity": 1, "energy": 1, "priority": 1}
+
+
+def rescore_tasks(user_id: str, task_ids: list[str] | None = None, today: date | None = None) -> list[dict]:
+    """Recompute the scores of the user's open tasks (all, or just `task_ids`).
+
+    Only changed scores are written, each guarded on the inputs it was computed
+    from so a concurrent edit is never overwritten. Returns the task documents
+    (with their new ``priority``) in ``_id`` order.
+    """
+    return _rescore(user_id, task_ids, today)[0]
+
+
+def _rescore(user_id: str, task_ids: list[str] | None, today: date | None) -> tuple[list[dict], int]:
+    """``rescore_tasks`` plus the number of tasks whose scores changed."""
+    today = today or datetime.utcnow().date()
+    weights = profile_weights()
+    query = {"user_id": user_id, "completed": False}
+    if task_ids is not None:
+        oids = []
+        for tid in task_ids:
+            try:
+                oids.append(ObjectId(tid))
+            except (InvalidId, TypeError):
+                continue
+        query["_id"] = {"$in": oids}
+
+    docs = list(current_app.tasks.find(query, {**TASK_PROJECTION, **_SCORE_PROJECTION}).sort("_id", ASCENDING))
+    focus = focus_by_task(user_id, [str(d["_id"]) for d in docs] if task_ids is not None else None)
+
+    ops = []
+    for d in docs:
+        scores = score_fields(d, today, focus.get(str(d["_id"]), {}).get("minutes", 0), weights)
+        if d.get("priority") != scores:
+            guard = {k: d.get(k) for k in ("due_date", "importance", "complexity", "energy")}
+            ops.append(UpdateOne({"_id": d["_id"], "completed": False, **guard}, {"$set": {"priority": scores}}))
+            d["priority"] = scores
+    for i in range(0, len(ops), 1000):
+        current_app.tasks.bulk_write(ops[i : i + 1000], ordered=False)
+    return docs, len(ops)
+
+
+def refresh_priorities(user_id: str, today: date, force: bool = False) -> list[TaskView] | None:
+    """Rescore the user's open tasks once per day (and after a weights change).
+
+    Returns the freshly scored tasks, or None when the stored scores are current.
+    The day's marker is claimed atomically before rescoring, so concurrent
+    requests rescore once; the ones that lose the claim read the stored scores.
+    A rescore that changed any score bumps the data version, so whatever those
+    requests cached or tagged from the old scores is not served again.
+    """
+    try:
+        oid = ObjectId(user_id)
+    except (InvalidId, TypeError):
+        return None
+    marker = f"{today.isoformat()}:{_weights_key(profile_weights())}"
+    claim = {"_id": oid} if force else {"_id": oid, "priority_key": {"$ne": marker}}
+    prev = current_app.users.find_one_and_update(claim, {"$set": {"priority_key": marker}}, {"priority_key": 1})
+    if prev is None:
+        return None
+    try:
+        docs, changed = _rescore(user_id, None, today)
+    except Exception:
+        # hand the claim back so the next request retries
+        current_app.users.update_one(
+            {"_id": oid, "priority_key": marker}, {"$set": {"priority_key": prev.get("priority_key")}}
+        )
+        raise
+    if changed:
+        bump_data_version(user_id)
+    return [TaskView(d) for d in docs]
+
+
+def rescore_all(today: date | None = None) -> dict:
+    """Rescore every user's open tasks (daily pass / after changing weights)."""
+    today = today or datetime.utcnow().date()
+    report = {"users": 0, "tasks": 0}
+    for user_id in current_app.tasks.distinct("user_id", {"completed": False}):
+        report["users"] += 1
+        report["tasks"] += len(refresh_priorities(user_id, today, force=True) or [])
+    return report
+
+
+# -----------------------
+#  Top-k selection
+# -----------------------
+def top_tasks(user_id: str, profile: str, k: int) -> list[TaskView]:
+    """The user's `k` best open tasks for `profile`: one bounded scan of its partial index."""
+    field = f"priority.{profile}"
+    docs = (
+        current_app.tasks.find(
+            {"user_id": user_id, "completed": False, field: {"$exists": True}},
+            {**TASK_PROJECTION, "priority": 1},
+        )
+        .sort([(field, DESCENDING), ("_id", ASCENDING)])
+        .limit(k)
+    )
+    return [TaskView(d) for d in docs]
+
+
+def profile_bucket(profile: str, k: int, name: str | None = None) -> Bucket:
+    """``bucketize`` spec matching ``top_tasks`` for already loaded (``_id``-ordered) tasks.
+
+    Ties keep input order, matching the index's ``_id`` tie-break.
+    """
+    return Bucket(
+        name or profile,
+        when=lambda t: not t.completed and bool(t.priority) and profile in t.priority,
+        key=lambda t: t.priority[profile],
+        k=k,
+    )
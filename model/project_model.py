@@ -5,6 +5,11 @@ from bson import ObjectId
 from bson.errors import InvalidId
 from flask import current_app
 
+from model.archive_model import add_archived_rollups, archived_task_counts
+from utils.audit import audit
+from utils.cache import bump_data_version
+from utils.unit_of_work import request_get_many, request_read, request_seed
+
 
 def _safe_object_id(oid: str):
     try:
@@ -13,32 +18,88 @@ def _safe_object_id(oid: str):
         return None
 
 
-def _audit(user_id: str, action: str, payload: dict):
-    try:
-        current_app.audit_logs.insert_one(
-            {"user_id": user_id, "action": action, "created_at": datetime.utcnow(), "payload": payload}
-        )
-    except Exception:
-        pass
+def _project(doc: dict) -> dict:
+    return {"id": str(doc["_id"]), "name": doc.get("name", "")}
 
 
 def list_projects(user_id: str):
-    docs = list(current_app.projects.find({"user_id": user_id}).sort("name", 1))
-    return [{"id": str(d["_id"]), "name": d.get("name", "")} for d in docs]
+    """The user's projects by name; read once per request (see utils/unit_of_work.py)."""
+
+    def load():
+        projects = [_project(d) for d in current_app.projects.find({"user_id": user_id}).sort("name", 1)]
+        # later get_project() calls in the same request are answered from this list
+        request_seed("projects", user_id, {p["id"]: p for p in projects})
+        return projects
+
+    return request_read("projects", user_id, load)
+
+
+_COMPLETED = {"$cond": [{"$eq": ["$completed", True]}, 1, 0]}
+
+
+def project_rollup_stages(user_id: str) -> list:
+    """Aggregation stages over a user's tasks that group them per project.
+
+    Each output row is {_id: project_id, tasks_total, tasks_done, focus_minutes};
+    focus minutes come from the per-task focus rollups.
+    """
+    return [
+        {"$match": {"user_id": user_id, "project_id": {"$nin": [None, ""]}}},
+        {"$project": {"project_id": 1, "completed": 1}},
+        {
+            "$lookup": {
+                "from": "focus_rollups",
+                "let": {"tid": {"$toString": "$_id"}},
+                "pipeline": [
+                    {"$match": {"user_id": user_id, "$expr": {"$eq": ["$task_id", "$$tid"]}}},
+                    {"$project": {"_id": 0, "minutes": 1}},
+                ],
+                "as": "focus",
+            }
+        },
+        {
+            "$group": {
+                "_id": "$project_id",
+                "tasks_total": {"$sum": 1},
+                "tasks_done": {"$sum": _COMPLETED},
+                "focus_minutes": {"$sum": {"$sum": "$focus.minutes"}},
+            }
+        },
+    ]
+
+
+def project_rollups(user_id: str) -> dict:
+    """Return {project_id: {"tasks_total", "tasks_done", "focus_minutes"}} in one aggregation.
+
+    Archived tasks are added from their counters.
+    """
+    rollups = {row.pop("_id"): row for row in current_app.tasks.aggregate(project_rollup_stages(user_id))}
+    return add_archived_rollups(rollups, archived_task_counts(user_id))
+
+
+def get_projects_by_ids(user_id: str, project_ids) -> dict:
+    """{project_id: project} for the ids that exist; unseen ids are loaded with one $in query per request."""
+
+    def load(ids: list[str]) -> dict:
+        docs = current_app.projects.find({"_id": {"$in": [ObjectId(i) for i in ids]}, "user_id": user_id})
+        return {str(d["_id"]): _project(d) for d in docs}
+
+    ids = [str(oid) for oid in map(_safe_object_id, project_ids) if oid]
+    return request_get_many("projects", user_id, ids, load) if ids else {}
 
 
 def get_project(user_id: str, project_id: str):
     oid = _safe_object_id(project_id)
     if not oid:
         return None
-    doc = current_app.projects.find_one({"_id": oid, "user_id": user_id})
-    return {"id": str(doc["_id"]), "name": doc.get("name", "")} if doc else None
+    return get_projects_by_ids(user_id, [project_id]).get(str(oid))
 
 
 def create_project(user_id: str, name: str) -> str:
     name = (name or "").strip()
     result = current_app.projects.insert_one({"user_id": user_id, "name": name, "created_at": datetime.utcnow()})
-    _audit(user_id, "CREATE_PROJECT", {"project_id": str(result.inserted_id)})
+    bump_data_version(user_id)
+    audit(user_id, "CREATE_PROJECT", {"project_id": str(result.inserted_id)})
     return str(result.inserted_id)
 
 
@@ -48,7 +109,8 @@ def update_project(user_id: str, project_id: str, name: str) -> bool:
         return False
     result = current_app.projects.update_one({"_id": oid, "user_id": user_id}, {"$set": {"name": (name or "").strip()}})
     if result.modified_count > 0:
-        _audit(user_id, "UPDATE_PROJECT", {"project_id": project_id})
+        bump_data_version(user_id)
+        audit(user_id, "UPDATE_PROJECT", {"project_id": project_id})
         return True
     return False
 
@@ -59,9 +121,12 @@ def delete_project(user_id: str, project_id: str) -> bool:
         return False
 
     current_app.tasks.update_many({"user_id": user_id, "project_id": project_id}, {"$set": {"project_id": None}})
+    current_app.tasks_archive.update_many({"user_id": user_id, "project_id": project_id}, {"$set": {"project_id": None}})
+    current_app.archive_stats.update_one({"user_id": user_id}, {"$unset": {f"projects.{project_id}": ""}})
     result = current_app.projects.delete_one({"_id": oid, "user_id": user_id})
 
     if result.deleted_count > 0:
-        _audit(user_id, "DELETE_PROJECT", {"project_id": project_id})
+        bump_data_version(user_id)
+        audit(user_id, "DELETE_PROJECT", {"project_id": project_id})
         return True
     return False
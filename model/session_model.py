@@ -0,0 +1,136 @@
+"""Focus / break session ingestion.
+
+The timer pages queue finished sessions in the browser and send them in
+batches, each with a client-generated id (stored as ``client_id``). Sessions
+are written with one ``insert_many`` per collection; the unique
+``(user_id, client_id)`` index (migration 6) turns a retried session into a
+duplicate-key error, reported back as already recorded, so flaky networks
+neither lose nor double-count sessions.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from flask import current_app
+from pymongo.errors import BulkWriteError
+
+from model.focus_model import record_focus_sessions
+from model.priority_model import rescore_tasks
+from model.settings_model import DEFAULTS
+from model.stats_model import record_daily_stats
+from utils.cache import bump_data_version
+
+MAX_BATCH = 100
+KINDS = ("focus", "break", "long_break")
+# Queued sessions keep the time they ended; anything older/newer than this is clamped to now.
+MAX_BACKDATE = timedelta(days=7)
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+_DUPLICATE_KEY = 11000
+
+
+def _clamp_int(value, lo: int, hi: int, default: int) -> int:
+    try:
+        return max(lo, min(hi, int(value)))
+    except (TypeError, ValueError):
+        return default
+
+
+def _ended_at(value, now: datetime) -> datetime:
+    """Accept epoch milliseconds (Date.now()) or an ISO string; fall back to `now`."""
+    try:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            ended = datetime.utcfromtimestamp(value / 1000)
+        elif isinstance(value, str):
+            ended = datetime.fromisoformat(value.replace("Z", "+00:00"))
+            if ended.tzinfo is not None:
+                ended = ended.astimezone(timezone.utc).replace(tzinfo=None)
+        else:
+            return now
+    except (ValueError, OverflowError, OSError):
+        return now
+    if ended > now + MAX_CLOCK_SKEW or ended < now - MAX_BACKDATE:
+        return now
+    return min(ended, now)
+
+
+def normalize_session(user_id: str, item: dict, now: datetime) -> tuple[str, dict]:
+    """Return (collection name, document) for one posted session; ValueError on bad input."""
+    if not isinstance(item, dict):
+        raise ValueError("invalid_session")
+
+    kind = item.get("kind") or "focus"
+    if kind not in KINDS:
+        raise ValueError("invalid_kind")
+
+    client_id = item.get("id")
+    if client_id is not None and (not isinstance(client_id, str) or not 0 < len(client_id) <= 64):
+        raise ValueError("invalid_id")
+
+    doc = {"user_id": user_id, "created_at": _ended_at(item.get("ended_at"), now)}
+    if kind == "focus":
+        collection = "focus_sessions"
+        doc["minutes"] = _clamp_int(item.get("minutes"), 1, 180, DEFAULTS["focus_minutes"])
+        task_id = item.get("task_id") or None
+        # stored as-is and used as a rollup key, so it must be a task id string
+        if task_id is not None and not (isinstance(task_id, str) and ObjectId.is_valid(task_id)):
+            raise ValueError("invalid_task_id")
+        doc["task_id"] = task_id
+    else:
+        collection = "break_sessions"
+        doc["minutes"] = _clamp_int(item.get("minutes"), 1, 90, DEFAULTS["break_minutes"])
+        doc["mode"] = kind
+    if client_id is not None:
+        doc["client_id"] = client_id
+    return collection, doc
+
+
+def ingest_sessions(user_id: str, items: list) -> dict:
+    """Insert a batch of sessions idempotently.
+
+    Returns the posted ids grouped as ``accepted`` (newly stored),
+    ``duplicates`` (stored by an earlier attempt), ``invalid`` (never
+    storable, drop them) and ``failed`` (write error, retry later).
+    """
+    now = datetime.utcnow()
+    result = {"accepted": [], "duplicates": [], "invalid": [], "failed": []}
+    batches: dict[str, list[tuple[object, dict]]] = {}
+
+    for i, item in enumerate(items):
+        ref = item.get("id") if isinstance(item, dict) and item.get("id") is not None else i
+        try:
+            collection, doc = normalize_session(user_id, item, now)
+        except ValueError as exc:
+            result["invalid"].append({"id": ref, "error": str(exc)})
+            continue
+        batches.setdefault(collection, []).append((ref, doc))
+
+    inserted = {"focus_sessions": [], "break_sessions": []}
+    for collection, pairs in batches.items():
+        docs = [doc for _, doc in pairs]
+        errors = {}
+        try:
+            getattr(current_app, collection).insert_many(docs, ordered=False)
+        except BulkWriteError as exc:
+            errors = {e["index"]: e.get("code") for e in exc.details.get("writeErrors", [])}
+
+        for index, (ref, doc) in enumerate(pairs):
+            if index not in errors:
+                result["accepted"].append(ref)
+                inserted[collection].append(doc)
+            elif errors[index] == _DUPLICATE_KEY:
+                result["duplicates"].append(ref)
+            else:
+                result["failed"].append(ref)
+
+    if inserted["focus_sessions"]:
+        record_focus_sessions(user_id, inserted["focus_sessions"])
+        # focus time lowers the tasks' neglect factor
+        task_ids = {d["task_id"] for d in inserted["focus_sessions"] if d.get("task_id")}
+        if task_ids:
+            rescore_tasks(user_id, list(task_ids))
+    if result["accepted"]:
+        record_daily_stats(user_id, inserted["focus_sessions"], inserted["break_sessions"])
+        bump_data_version(user_id)
+    return result
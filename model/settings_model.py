@@ -0,0 +1,68 @@
+"""Settings service.
+
+One place to read and write a user's timer/theme settings. Reads go through
+a per-process TTL+LRU cache (``app.settings_cache``), so /timer, /break and
+/api/settings render without a database round trip in the steady state.
+``save_settings()`` invalidates the local entry synchronously and, when
+``SETTINGS_INVALIDATION=redis`` is set, tells the other workers as well;
+without the channel other workers converge within ``SETTINGS_CACHE_TTL``.
+"""
+
+from __future__ import annotations
+
+import os
+
+from flask import current_app
+
+from utils.cache import RedisInvalidationChannel, TTLCache
+
+DEFAULTS = {
+    "focus_minutes": 25,
+    "break_minutes": 5,
+    "long_break_minutes": 15,
+    "sessions_before_long_break": 4,
+    "theme": "light",
+}
+
+_PROJECTION = {"_id": 0, **{k: 1 for k in DEFAULTS}}
+
+
+def init_settings_cache(app) -> TTLCache:
+    cache = TTLCache(
+        max_entries=int(os.environ.get("SETTINGS_CACHE_SIZE", "10000")),
+        ttl=float(os.environ.get("SETTINGS_CACHE_TTL", "60")),
+    )
+    app.settings_cache = cache
+    app.settings_channel = None
+    if os.environ.get("SETTINGS_INVALIDATION") == "redis":
+        app.settings_channel = RedisInvalidationChannel(
+            os.environ.get("CACHE_REDIS_URL", "redis://localhost:6379/0"), "settings-invalidate", cache
+        )
+    return cache
+
+
+def _load(user_id: str) -> dict:
+    doc = current_app.settings.find_one({"user_id": user_id}, _PROJECTION) or {}
+    out = dict(DEFAULTS)
+    for k in DEFAULTS:
+        if doc.get(k) is not None:
+            out[k] = doc.get(k)
+    return out
+
+
+def get_settings(user_id: str) -> dict:
+    """The user's settings merged over DEFAULTS; the returned dict is the caller's to modify."""
+    if current_app.settings_channel is not None:
+        current_app.settings_channel.start()
+    return dict(current_app.settings_cache.get_or_load(user_id, lambda: _load(user_id)))
+
+
+def save_settings(user_id: str, updates: dict):
+    current_app.settings.update_one(
+        {"user_id": user_id},
+        {"$set": {"user_id": user_id, **updates}},
+        upsert=True,
+    )
+    current_app.settings_cache.invalidate(user_id)
+    if current_app.settings_channel is not None:
+        current_app.settings_channel.publish(user_id)
@@ -0,0 +1,176 @@
+"""Daily activity stats.
+
+One document per (user, UTC day) with that day's focus / break totals:
+
+    {user_id, day, focus_minutes, focus_sessions, break_minutes,
+     break_sessions, modes: {focus, break, long_break}}
+
+Session ingestion ``$inc``s them, so a chart over any date range reads at most
+one small document per day instead of every session in the range.
+``rebuild_daily_stats()`` recomputes past days from raw sessions, archived
+ones included (backfill/repair).
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from flask import current_app
+from pymongo import DeleteOne, InsertOne, ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+STAT_FIELDS = ("focus_minutes", "focus_sessions", "break_minutes", "break_sessions")
+MODES = ("focus", "break", "long_break")
+
+# Extra passes over a user whose guarded writes lost to concurrent ingestion.
+RETRY_PASSES = 3
+
+
+def day_of(ts: datetime) -> datetime:
+    return datetime.combine(ts.date(), datetime.min.time())
+
+
+def record_daily_stats(user_id: str, focus: list[dict], breaks: list[dict]):
+    """Add freshly stored session documents to their days: one upsert per day, one bulk_write."""
+    per_day: dict[datetime, dict] = {}
+
+    def bump(doc: dict, prefix: str, mode: str):
+        inc = per_day.setdefault(day_of(doc["created_at"]), {})
+        for key, value in (
+            (f"{prefix}_minutes", int(doc.get("minutes", 0) or 0)),
+            (f"{prefix}_sessions", 1),
+            (f"modes.{mode}", 1),
+        ):
+            inc[key] = inc.get(key, 0) + value
+
+    for doc in focus:
+        bump(doc, "focus", "focus")
+    for doc in breaks:
+        bump(doc, "break", doc.get("mode") or "break")
+
+    ops = [
+        UpdateOne(
+            {"user_id": user_id, "day": day},
+            {"$inc": inc, "$setOnInsert": {"user_id": user_id, "day": day}},
+            upsert=True,
+        )
+        for day, inc in per_day.items()
+    ]
+    if ops:
+        current_app.daily_stats.bulk_write(ops, ordered=False)
+
+
+# -----------------------
+#  Backfill / repair
+# -----------------------
+def _day_group(prefix: str, mode) -> list[dict]:
+    return [
+        {
+            "$group": {
+                "_id": {"user_id": "$user_id", "day": {"$dateTrunc": {"date": "$created_at", "unit": "day"}}, "mode": mode},
+                "minutes": {"$sum": "$minutes"},
+                "sessions": {"$sum": 1},
+            }
+        },
+        {"$set": {"prefix": prefix}},
+    ]
+
+
+def _counters(doc: dict) -> tuple:
+    modes = {m: n for m, n in (doc.get("modes") or {}).items() if n}
+    return tuple(doc.get(f) or 0 for f in STAT_FIELDS) + tuple(sorted(modes.items()))
+
+
+def _as_read(doc: dict) -> dict:
+    """Filter that only matches ``doc`` while no ``$inc`` has landed on it since it was read."""
+    guard = {"_id": doc["_id"], **{f: doc.get(f) for f in STAT_FIELDS}}
+    modes = doc.get("modes") or {}
+    for mode in MODES:
+        guard[f"modes.{mode}"] = modes.get(mode)
+    return guard
+
+
+def _rebuild_user_days(user_id: str, before: datetime) -> dict:
+    # Read the day documents before the sessions: a session stored in between
+    # changes its day document, so the guarded write below skips it.
+    existing = {d["day"]: d for d in current_app.daily_stats.find({"user_id": user_id, "day": {"$lt": before}})}
+
+    match = {"user_id": user_id, "created_at": {"$lt": before}}
+    pipeline = [
+        {"$match": match},
+        # archived sessions still count (see model/archive_model.py)
+        {"$unionWith": {"coll": "focus_sessions_archive", "pipeline": [{"$match": match}]}},
+        *_day_group("focus", "focus"),
+        {
+            "$unionWith": {
+                "coll": "break_sessions",
+                "pipeline": [
+                    {"$match": match},
+                    {"$unionWith": {"coll": "break_sessions_archive", "pipeline": [{"$match": match}]}},
+                    *_day_group("break", {"$ifNull": ["$mode", "break"]}),
+                ],
+            }
+        },
+    ]
+
+    days: dict[datetime, dict] = {}
+    for row in current_app.focus_sessions.aggregate(pipeline):
+        day = row["_id"]["day"]
+        doc = days.setdefault(day, {"user_id": user_id, "day": day, **{f: 0 for f in STAT_FIELDS}, "modes": {}})
+        doc[f"{row['prefix']}_minutes"] += int(row.get("minutes", 0) or 0)
+        doc[f"{row['prefix']}_sessions"] += row["sessions"]
+        mode = row["_id"]["mode"]
+        doc["modes"][mode] = doc["modes"].get(mode, 0) + row["sessions"]
+
+    ops = []
+    for day, doc in days.items():
+        cur = existing.get(day)
+        if cur is None:
+            # (user_id, day) is unique, so this loses to a concurrent ingestion upsert
+            ops.append(InsertOne(doc))
+        elif _counters(cur) != _counters(doc):
+            ops.append(ReplaceOne(_as_read(cur), doc))
+    # days that no longer have any sessions
+    ops += [DeleteOne(_as_read(cur)) for day, cur in existing.items() if day not in days]
+
+    report = {"written": 0, "removed": 0, "skipped": 0}
+    if not ops:
+        return report
+    try:
+        result = current_app.daily_stats.bulk_write(ops, ordered=False).bulk_api_result
+    except BulkWriteError as e:
+        result = e.details
+    report["written"] = result["nInserted"] + result["nMatched"]
+    report["removed"] = result["nRemoved"]
+    report["skipped"] = len(ops) - report["written"] - report["removed"]
+    return report
+
+
+def rebuild_daily_stats(user_id: str | None = None, include_today: bool = False) -> dict:
+    """Recompute day documents from raw sessions. Idempotent; safe to re-run.
+
+    Works one user at a time and by default leaves today alone, since live
+    ingestion is still adding to it (the first backfill passes
+    ``include_today``). Each write is guarded on the counters read, so a
+    document that ingestion ``$inc``s meanwhile is skipped and the user is
+    retried (up to ``RETRY_PASSES`` times).
+    """
+    if user_id:
+        user_ids = [user_id]
+    else:
+        user_ids = set(current_app.daily_stats.distinct("user_id"))
+        for name in ("focus_sessions", "focus_sessions_archive", "break_sessions", "break_sessions_archive"):
+            user_ids |= set(getattr(current_app, name).distinct("user_id"))
+
+    before = day_of(datetime.utcnow()) + timedelta(days=1 if include_today else 0)
+    report = {"users": 0, "days": 0, "removed": 0, "skipped": 0}
+    for uid in user_ids:
+        for _ in range(1 + RETRY_PASSES):
+            r = _rebuild_user_days(uid, before)
+            report["days"] += r["written"]
+            report["removed"] += r["removed"]
+            if not r["skipped"]:
+                break
+        report["users"] += 1
+        report["skipped"] += r["skipped"]
+    return report
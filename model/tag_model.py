@@ -2,27 +2,99 @@
 
 Tags are reusable labels (Study, Work, etc.). They improve UI filtering and
 help satisfy the multiple-collections requirement with a real use case.
+
+Each tag document keeps a ``usage_count`` of the tasks that carry it, updated
+incrementally whenever task tags change.
 """
 
 from __future__ import annotations
 
+import threading
+from collections import OrderedDict
 from datetime import datetime
+
 from flask import current_app
+from pymongo import UpdateOne
+
+from utils.unit_of_work import request_read
+
+DEFAULT_TAGS = ["Study", "Work", "Health", "Personal"]
+
+# Per-user names already known to exist, so repeated ensure_tags_exist()
+# calls skip the database. Bounded LRU; tags are never deleted by the app.
+_KNOWN_TAGS_MAX_USERS = 1000
+_known_tags: OrderedDict[str, set[str]] = OrderedDict()
+_known_lock = threading.Lock()
+
+
+def _clean(names) -> list[str]:
+    return list(dict.fromkeys(n.strip() for n in names or [] if isinstance(n, str) and n.strip()))
+
+
+def _known(user_id: str) -> set[str]:
+    with _known_lock:
+        names = _known_tags.get(user_id)
+        if names is None:
+            return set()
+        _known_tags.move_to_end(user_id)
+        return set(names)
+
+
+def _remember(user_id: str, names):
+    with _known_lock:
+        _known_tags.setdefault(user_id, set()).update(names)
+        _known_tags.move_to_end(user_id)
+        while len(_known_tags) > _KNOWN_TAGS_MAX_USERS:
+            _known_tags.popitem(last=False)
+
+
+def _upsert_op(user_id: str, name: str, inc: int = 0) -> UpdateOne:
+    update = {"$setOnInsert": {"user_id": user_id, "name": name, "created_at": datetime.utcnow()}}
+    if inc:
+        update["$inc"] = {"usage_count": inc}
+    else:
+        update["$setOnInsert"]["usage_count"] = 0
+    return UpdateOne({"user_id": user_id, "name": name}, update, upsert=True)
 
 
 def ensure_tags_exist(user_id: str, tag_names: list[str]):
-    """Create tags if they don't exist. Idempotent."""
-    for name in tag_names:
-        name = name.strip()
-        if not name:
+    """Create tags if they don't exist. Idempotent; one bulk_write for the unknown ones."""
+    names = [n for n in _clean(tag_names) if n not in _known(user_id)]
+    if not names:
+        return
+    current_app.tags.bulk_write([_upsert_op(user_id, n) for n in names], ordered=False)
+    _remember(user_id, names)
+
+
+def record_tag_usage(user_id: str, added: list[str] | None = None, removed: list[str] | None = None):
+    """Adjust usage counts after one task's tags change; tags in `added` are registered if new."""
+    deltas: dict[str, int] = {}
+    for name in _clean(added):
+        deltas[name] = deltas.get(name, 0) + 1
+    for name in _clean(removed):
+        deltas[name] = deltas.get(name, 0) - 1
+    record_tag_deltas(user_id, deltas)
+
+
+def record_tag_deltas(user_id: str, deltas: dict[str, int]):
+    """Apply {tag: +n / -n} usage changes in one bulk_write."""
+    ops = []
+    for name, delta in deltas.items():
+        if not delta:
             continue
-        current_app.tags.update_one(
-            {"user_id": user_id, "name": name},
-            {"$setOnInsert": {"user_id": user_id, "name": name, "created_at": datetime.utcnow()}},
-            upsert=True,
-        )
+        if delta > 0:
+            ops.append(_upsert_op(user_id, name, inc=delta))
+        else:
+            ops.append(UpdateOne({"user_id": user_id, "name": name}, {"$inc": {"usage_count": delta}}))
+    if ops:
+        current_app.tags.bulk_write(ops, ordered=False)
+        _remember(user_id, [n for n, d in deltas.items() if d > 0])
 
 
 def list_tags(user_id: str):
-    docs = list(current_app.tags.find({"user_id": user_id}).sort("name", 1))
-    return [d.get("name", "") for d in docs]
+    """The user's tag names; read once per request (see utils/unit_of_work.py)."""
+
+    def load():
+        return [d.get("name", "") for d in current_app.tags.find({"user_id": user_id}, {"name": 1}).sort("name", 1)]
+
+    return request_read("tags", user_id, load)
@@ -0,0 +1,108 @@
+"""Single-pass task bucketing.
+
+``bucketize(tasks, buckets)`` walks a task list once and, for every
+``Bucket`` a task falls into, counts it, adds to the bucket's running total
+and offers it to the bucket's bounded heap. A view that needs several
+filtered, ranked lists plus KPI counts gets them all from one pass, in
+O(n log k) time and O(k) extra memory per bucket.
+
+Ranked buckets keep the best ``k`` items by ``key`` (largest first, or
+smallest first with ``largest=False``); ties keep input order, like
+``heapq.nlargest`` / ``sorted``. ``k=None`` keeps every match.
+"""
+
+from __future__ import annotations
+
+import heapq
+from typing import Any, Callable, Iterable
+
+
+class Bucket:
+    """One output of ``bucketize``: which tasks (`when`), how many to keep (`k`) and in what order (`key`).
+
+    ``k=0`` only counts / totals; ``k=None`` keeps every match (sorted by
+    `key` if given, else in input order).
+    """
+
+    __slots__ = ("name", "when", "key", "k", "largest", "total")
+
+    def __init__(
+        self,
+        name: str,
+        when: Callable[[Any], bool] | None = None,
+        key: Callable[[Any], Any] | None = None,
+        k: int | None = 0,
+        largest: bool = True,
+        total: Callable[[Any], float] | None = None,
+    ):
+        self.name = name
+        self.when = when
+        self.key = key
+        self.k = k
+        self.largest = largest
+        self.total = total
+
+
+class BucketResult:
+    __slots__ = ("count", "total", "items")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.items: list = []
+
+
+class _Smallest:
+    """Inverts ordering so the min-heap's root is the worst of the smallest-k."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other: "_Smallest") -> bool:
+        return other.value < self.value
+
+    def __eq__(self, other) -> bool:
+        return self.value == other.value
+
+
+def bucketize(tasks: Iterable, buckets: list[Bucket]) -> dict[str, BucketResult]:
+    """Classify every task once into all `buckets`; returns {name: BucketResult}."""
+    results = {b.name: BucketResult() for b in buckets}
+    # attribute lookups hoisted out of the per-task loop: [when, key, k, largest, total, result, heap]
+    plan = [[b.when, b.key, b.k, b.largest, b.total, results[b.name], []] for b in buckets]
+    push, replace = heapq.heappush, heapq.heapreplace
+
+    for seq, task in enumerate(tasks):
+        for when, key_fn, k, largest, total, result, heap in plan:
+            if when is not None and not when(task):
+                continue
+            result.count += 1
+            if total is not None:
+                result.total += total(task)
+            if k == 0:
+                continue
+            if key_fn is None:
+                if k is None or len(heap) < k:
+                    heap.append(task)
+                continue
+            key = key_fn(task)
+            if k is not None and len(heap) >= k:
+                # full: only a strictly better key gets in (an equal one came later, so it loses)
+                worst = heap[0][0]
+                if not (key > worst if largest else key < worst.value):
+                    continue
+                # -seq: on equal keys the earlier task ranks higher
+                replace(heap, (key if largest else _Smallest(key), -seq, task))
+            elif k is None:
+                heap.append((key if largest else _Smallest(key), -seq, task))
+            else:
+                push(heap, (key if largest else _Smallest(key), -seq, task))
+
+    for b, (*_, result, heap) in zip(buckets, plan):
+        if b.key is None:
+            result.items = heap
+        else:
+            result.items = [entry[2] for entry in sorted(heap, reverse=True)]
+    return results
@@ -1,9 +1,23 @@
 from __future__ import annotations
 
-from datetime import datetime
-from bson import ObjectId
+import base64
+from datetime import date, datetime, timedelta
+from bson import ObjectId, json_util
 from bson.errors import InvalidId
 from flask import current_app
+from pymongo import ASCENDING, DESCENDING, DeleteOne, ReturnDocument, UpdateOne
+
+from utils.audit import audit
+from utils.cache import bump_data_version
+from utils.unit_of_work import request_get_many
+from model.tag_model import record_tag_deltas, record_tag_usage
+from model.task_schema import (
+    SCHEMA_VERSION,
+    importance_rank_for,
+    normalize_task_fields,
+)
+from model.task_view import TASK_PROJECTION, TaskView
+from model.priority_model import rescore_tasks, score_new_task
 
 
 def _safe_object_id(oid: str):
@@ -13,121 +27,362 @@ def _safe_object_id(oid: str):
         return None
 
 
-def _mongo_to_task(doc):
-    return {
-        "id": str(doc["_id"]),
-        "user_id": doc.get("user_id"),
-        "project_id": doc.get("project_id"),
-        "tags": doc.get("tags", []),
-        "title": doc.get("title", ""),
-        "description": doc.get("description", ""),
-        "due_date": doc.get("due_date", ""),
-        "importance": doc.get("importance", "Low"),
-        "complexity": doc.get("complexity", 1),
-        "energy": doc.get("energy", 1),
-        "completed": doc.get("completed", False),
-    }
+# Every sort mode keeps all keys (including the _id tie-breaker) in one
+# direction, so each is served forwards or backwards by one ascending index
+# declared in model/migrations.py.
+SORTS = {
+    "due_date": [("due_date", ASCENDING), ("_id", ASCENDING)],
+    "importance": [("importance_rank", DESCENDING), ("complexity", DESCENDING), ("_id", DESCENDING)],
+    "complexity": [("complexity", DESCENDING), ("_id", DESCENDING)],
+}
 
+PAGE_SIZE = 50
 
-def _audit(user_id: str, action: str, payload: dict):
-    try:
-        current_app.audit_logs.insert_one(
-            {"user_id": user_id, "action": action, "created_at": datetime.utcnow(), "payload": payload}
-        )
-    except Exception:
-        pass
 
-
-importance_rank = {"Low": 1, "Medium": 2, "High": 3}
-
-
-def get_all_tasks_sorted(user_id: str, sort_param: str, project_id: str | None = None):
+def _task_query(user_id: str, project_id: str | None = None) -> dict:
     query = {"user_id": user_id}
     if project_id:
         if project_id == "__none__":
             query["project_id"] = None
         else:
             query["project_id"] = project_id
+    return query
 
-    docs = list(current_app.tasks.find(query))
 
-    if sort_param == "importance":
-        docs.sort(key=lambda d: importance_rank.get(d.get("importance", "Low"), 0), reverse=True)
-    elif sort_param == "complexity":
-        docs.sort(key=lambda d: d.get("complexity", 1), reverse=True)
-    else:
-        docs.sort(key=lambda d: d.get("due_date", ""))
+def _sort_value(doc: dict, field: str):
+    if field == "importance_rank":
+        return doc.get("importance_rank", importance_rank_for(doc.get("importance")))
+    return doc.get(field)
 
-    return [_mongo_to_task(d) for d in docs]
 
+def encode_cursor(doc: dict, sort: list) -> str:
+    """Opaque keyset cursor: the sort-key values of the last row on a page."""
+    values = [_sort_value(doc, field) for field, _ in sort]
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode("utf-8")).decode("ascii")
 
-def get_tasks_for_dashboard(user_id: str, mood: str):
-    docs = list(current_app.tasks.find({"user_id": user_id}))
 
-    if mood == "energetic":
-        docs.sort(key=lambda d: d.get("complexity", 1), reverse=True)
-    elif mood == "focused":
-        docs.sort(
-            key=lambda d: (importance_rank.get(d.get("importance", "Low"), 0), d.get("complexity", 1)),
-            reverse=True,
-        )
-    elif mood == "calm":
-        docs.sort(key=lambda d: d.get("complexity", 1))
-    elif mood == "creative":
-        docs.sort(key=lambda d: d.get("energy", 1))
+def decode_cursor(cursor: str, sort: list):
+    try:
+        values = json_util.loads(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))
+    except (ValueError, TypeError, UnicodeError):
+        return None
+    if not isinstance(values, list) or len(values) != len(sort) or not isinstance(values[-1], ObjectId):
+        return None
+    return values
+
+
+# BSON compares values of different types by type: null < numbers < strings < dates.
+# Half-migrated tasks mix them in one sort key (due_date: null, "" / legacy
+# strings and dates; numbers still stored as strings), so "after" a value also
+# means every value of a type that sorts after it.
+_BSON_TYPES = (None, "number", "string", "date")
+
+
+def _type_rank(value) -> int | None:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return 1
+    if isinstance(value, str):
+        return 2
+    if isinstance(value, datetime):
+        return 3
+    return None
+
+
+def _after(value, direction: int) -> list:
+    """Conditions matching the values strictly after `value` in `direction` (None matches null / missing)."""
+    if value is None:
+        return [] if direction == DESCENDING else [{"$ne": None}]
+    conds: list = [{"$gt" if direction == ASCENDING else "$lt": value}]
+    rank = _type_rank(value)
+    if rank is not None:
+        types = _BSON_TYPES[rank + 1 :] if direction == ASCENDING else _BSON_TYPES[1:rank]
+        conds += [{"$type": t} for t in types]
+        if direction == DESCENDING:
+            conds.append(None)
+    return conds
+
+
+def _keyset_filter(sort: list, values: list) -> dict:
+    """Match rows strictly after `values` in `sort` order, across mixed value types."""
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        prefix = {f: v for (f, _), v in zip(sort[:i], values[:i])}
+        clauses += [{**prefix, field: cond} for cond in _after(values[i], direction)]
+    return {"$or": clauses}
+
+
+def get_all_tasks_sorted(user_id: str, sort_param: str, project_id: str | None = None):
+    sort = SORTS.get(sort_param, SORTS["due_date"])
+    docs = current_app.tasks.find(_task_query(user_id, project_id), TASK_PROJECTION).sort(sort)
+    return [TaskView(d) for d in docs]
+
+
+def get_tasks_page(
+    user_id: str,
+    sort_param: str,
+    project_id: str | None = None,
+    cursor: str | None = None,
+    limit: int = PAGE_SIZE,
+    include_archived: bool = False,
+):
+    """One page of tasks in index order plus the cursor for the next page (or None).
+
+    With ``include_archived`` the page is merged server-side with the user's
+    archived tasks (same filter, sort and cursor).
+    """
+    sort = SORTS.get(sort_param, SORTS["due_date"])
+    query = _task_query(user_id, project_id)
+
+    values = decode_cursor(cursor, sort) if cursor else None
+    if values:
+        query = {"$and": [query, _keyset_filter(sort, values)]}
+
+    projection = {**TASK_PROJECTION, "importance_rank": 1}
+    if include_archived:
+        branch = [{"$match": query}, {"$sort": dict(sort)}, {"$limit": limit + 1}, {"$project": projection}]
+        pipeline = [
+            *branch,
+            {"$unionWith": {"coll": "tasks_archive", "pipeline": branch}},
+            {"$sort": dict(sort)},
+            {"$limit": limit + 1},
+        ]
+        docs = list(current_app.tasks.aggregate(pipeline))
     else:
-        docs.sort(key=lambda d: d.get("due_date", ""))
+        docs = list(current_app.tasks.find(query, projection).sort(sort).limit(limit + 1))
+
+    next_cursor = encode_cursor(docs[limit - 1], sort) if len(docs) > limit else None
+    return [TaskView(d) for d in docs[:limit]], next_cursor
+
+
+def task_counts(user_id: str) -> dict:
+    """Open / completed task counts (index-only counts on (user_id, completed))."""
+    return {
+        "open": current_app.tasks.count_documents({"user_id": user_id, "completed": False}),
+        "done": current_app.tasks.count_documents({"user_id": user_id, "completed": True}),
+    }
+
+
+def due_buckets(user_id: str, today: date, soon_days: int = 3, limit: int = 5) -> dict:
+    """Open tasks that are overdue, due today or due within `soon_days`.
+
+    Each bucket is an indexed range query on (user_id, completed, due_date):
+    returns {bucket: {"count": int, "tasks": [first `limit` tasks by due date]}}.
+    ``limit=0`` only counts.
+    """
+    start = datetime.combine(today, datetime.min.time())
+    ranges = {
+        "overdue": {"$lt": start},
+        "today": {"$gte": start, "$lt": start + timedelta(days=1)},
+        "soon": {"$gte": start + timedelta(days=1), "$lt": start + timedelta(days=soon_days + 1)},
+    }
+
+    out = {}
+    for name, due_range in ranges.items():
+        query = {"user_id": user_id, "completed": False, "due_date": due_range}
+        tasks = []
+        if limit:
+            docs = current_app.tasks.find(query, TASK_PROJECTION).sort([("due_date", ASCENDING), ("_id", ASCENDING)])
+            tasks = [TaskView(d) for d in docs.limit(limit)]
+        out[name] = {"count": current_app.tasks.count_documents(query), "tasks": tasks}
+    return out
+
+
+def get_tasks_by_ids(user_id: str, task_ids) -> dict:
+    """{task_id: TaskView} for the ids that exist; unseen ids are loaded with one $in query per request."""
+
+    def load(ids: list[str]) -> dict:
+        docs = current_app.tasks.find({"_id": {"$in": [ObjectId(i) for i in ids]}, "user_id": user_id})
+        return {str(d["_id"]): TaskView(d) for d in docs}
 
-    return [_mongo_to_task(d) for d in docs]
+    ids = [str(oid) for oid in map(_safe_object_id, task_ids) if oid]
+    return request_get_many("tasks", user_id, ids, load) if ids else {}
 
 
 def get_task_by_id(user_id: str, task_id: str):
     oid = _safe_object_id(task_id)
     if not oid:
         return None
-    doc = current_app.tasks.find_one({"_id": oid, "user_id": user_id})
-    return _mongo_to_task(doc) if doc else None
+    return get_tasks_by_ids(user_id, [task_id]).get(str(oid))
 
 
 def insert_task(user_id: str, task_data: dict):
-    task_data = {**task_data, "user_id": user_id}
+    task_data = {
+        "completed": False,
+        **normalize_task_fields(task_data),
+        "user_id": user_id,
+        "schema_version": SCHEMA_VERSION,
+    }
+    if task_data["completed"]:
+        task_data["completed_at"] = datetime.utcnow()
+    task_data["priority"] = score_new_task(task_data)
     result = current_app.tasks.insert_one(task_data)
-    _audit(user_id, "CREATE_TASK", {"task_id": str(result.inserted_id)})
+    record_tag_usage(user_id, added=task_data.get("tags"))
+    bump_data_version(user_id)
+    audit(user_id, "CREATE_TASK", {"task_id": str(result.inserted_id)})
     return str(result.inserted_id)
 
 
+# Inputs of the stored priority scores (see model/priority_model.py).
+_SCORED_FIELDS = {"due_date", "importance", "complexity", "energy"}
+
+
 def update_task(user_id: str, task_id: str, updates: dict) -> bool:
     oid = _safe_object_id(task_id)
     if not oid:
         return False
-    result = current_app.tasks.update_one({"_id": oid, "user_id": user_id}, {"$set": updates})
-    if result.modified_count > 0:
-        _audit(user_id, "UPDATE_TASK", {"task_id": task_id, "updates": list(updates.keys())})
-        return True
-    return False
+    updates = normalize_task_fields(updates)
+    before = current_app.tasks.find_one_and_update(
+        {"_id": oid, "user_id": user_id},
+        {"$set": updates},
+        projection={k: 1 for k in updates},
+        return_document=ReturnDocument.BEFORE,
+    )
+    if not before or all(before.get(k) == v for k, v in updates.items()):
+        return False
+
+    if "tags" in updates:
+        old_tags = set(before.get("tags") or [])
+        new_tags = set(updates["tags"] or [])
+        record_tag_usage(user_id, added=list(new_tags - old_tags), removed=list(old_tags - new_tags))
+    if _SCORED_FIELDS.intersection(updates):
+        rescore_tasks(user_id, [task_id])
+    bump_data_version(user_id)
+    audit(user_id, "UPDATE_TASK", {"task_id": task_id, "updates": list(updates.keys())})
+    return True
 
 
 def delete_task(user_id: str, task_id: str) -> bool:
     oid = _safe_object_id(task_id)
     if not oid:
         return False
-    result = current_app.tasks.delete_one({"_id": oid, "user_id": user_id})
-    if result.deleted_count > 0:
-        _audit(user_id, "DELETE_TASK", {"task_id": task_id})
+    doc = current_app.tasks.find_one_and_delete({"_id": oid, "user_id": user_id}, projection={"tags": 1})
+    if doc:
+        record_tag_usage(user_id, removed=doc.get("tags"))
+        bump_data_version(user_id)
+        audit(user_id, "DELETE_TASK", {"task_id": task_id})
         return True
     return False
 
 
+# Flips `completed` inside the update itself, so concurrent toggles never race.
+# `completed_at` (when a task was last marked done) decides when it gets archived.
+_TOGGLE_COMPLETED = [
+    {"$set": {"completed": {"$eq": [{"$ifNull": ["$completed", False]}, False]}}},
+    {"$set": {"completed_at": {"$cond": ["$completed", "$$NOW", "$$REMOVE"]}}},
+]
+_COMPLETE = [{"$set": {"completed": True, "completed_at": {"$ifNull": ["$completed_at", "$$NOW"]}}}]
+
+
 def toggle_task_complete(user_id: str, task_id: str):
     oid = _safe_object_id(task_id)
     if not oid:
         return False
 
-    doc = current_app.tasks.find_one({"_id": oid, "user_id": user_id})
+    doc = current_app.tasks.find_one_and_update(
+        {"_id": oid, "user_id": user_id},
+        _TOGGLE_COMPLETED,
+        projection={"completed": 1},
+        return_document=ReturnDocument.AFTER,
+    )
     if not doc:
         return False
 
-    new_value = not doc.get("completed", False)
-    current_app.tasks.update_one({"_id": oid, "user_id": user_id}, {"$set": {"completed": new_value}})
-    _audit(user_id, "TOGGLE_TASK", {"task_id": task_id, "completed": new_value})
+    new_value = doc["completed"]
+    if not new_value:
+        # scores of completed tasks are not kept current
+        rescore_tasks(user_id, [task_id])
+    bump_data_version(user_id)
+    audit(user_id, "TOGGLE_TASK", {"task_id": task_id, "completed": new_value})
     return new_value
+
+
+BULK_ACTIONS = ("complete", "reopen", "toggle", "delete", "move", "add_tags", "remove_tags")
+
+
+def bulk_update_tasks(
+    user_id: str,
+    action: str,
+    task_ids: list[str],
+    project_id: str | None = None,
+    tags: list[str] | None = None,
+) -> dict:
+    """Apply one action to many tasks with a single unordered bulk_write.
+
+    Ids are validated once up front; the per-item result is "ok", "invalid_id"
+    or "not_found". One audit event covers the whole batch.
+    """
+    if action not in BULK_ACTIONS:
+        raise ValueError(f"Unknown bulk action: {action}")
+
+    results = {}
+    oids = {}
+    for tid in dict.fromkeys(task_ids):
+        oid = _safe_object_id(tid)
+        results[tid] = "invalid_id" if oid is None else "not_found"
+        if oid is not None:
+            oids[oid] = tid
+
+    found = {}
+    if oids:
+        docs = current_app.tasks.find({"_id": {"$in": list(oids)}, "user_id": user_id}, {"tags": 1})
+        found = {d["_id"]: set(d.get("tags") or []) for d in docs}
+    for oid in found:
+        results[oids[oid]] = "ok"
+
+    filters = [{"_id": oid, "user_id": user_id} for oid in oids if oid in found]
+    if action == "delete":
+        ops = [DeleteOne(f) for f in filters]
+    else:
+        if action == "complete":
+            update = _COMPLETE
+        elif action == "reopen":
+            update = {"$set": {"completed": False}, "$unset": {"completed_at": ""}}
+        elif action == "toggle":
+            update = _TOGGLE_COMPLETED
+        elif action == "move":
+            update = {"$set": {"project_id": project_id or None}}
+        elif action == "add_tags":
+            update = {"$addToSet": {"tags": {"$each": list(tags or [])}}}
+        else:
+            update = {"$pull": {"tags": {"$in": list(tags or [])}}}
+        ops = [UpdateOne(f, update) for f in filters]
+
+    # tag usage changes implied by this batch (based on the tags read above)
+    tag_deltas: dict[str, int] = {}
+    for task_tags in found.values():
+        if action == "delete":
+            changed, sign = task_tags, -1
+        elif action == "add_tags":
+            changed, sign = set(tags or []) - task_tags, 1
+        elif action == "remove_tags":
+            changed, sign = set(tags or []) & task_tags, -1
+        else:
+            continue
+        for name in changed:
+            tag_deltas[name] = tag_deltas.get(name, 0) + sign
+
+    summary = {"matched": 0, "modified": 0, "deleted": 0}
+    if ops:
+        result = current_app.tasks.bulk_write(ops, ordered=False)
+        summary = {
+            "matched": result.matched_count,
+            "modified": result.modified_count,
+            "deleted": result.deleted_count,
+        }
+        record_tag_deltas(user_id, tag_deltas)
+        if action in ("reopen", "toggle"):
+            rescore_tasks(user_id, [oids[oid] for oid in found])
+        bump_data_version(user_id)
+        audit(
+            user_id,
+            f"BULK_{action.upper()}_TASKS",
+            {"task_ids": [oids[oid] for oid in oids if oid in found], **summary},
+        )
+
+    return {
+        "action": action,
+        **summary,
+        "results": [{"id": tid, "status": status} for tid, status in results.items()],
+    }
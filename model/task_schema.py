@@ -0,0 +1,166 @@
+"""Task document schema.
+
+Schema version 2 stores:
+- ``due_date`` as a BSON date (midnight UTC), or null when there is no due date
+- ``complexity`` / ``energy`` as ints clamped to 1..5
+- ``completed`` as a bool and ``importance_rank`` next to ``importance``
+
+Older documents (due dates as "%Y-%m-%d" strings, numbers as strings) are
+upgraded in batches by ``migrate_task_schema()``. The upgrade is resumable:
+progress is stored in the ``migration_progress`` collection and only
+documents that are not yet on the current version are touched.
+"""
+
+from __future__ import annotations
+
+import logging
+from datetime import date, datetime
+
+from flask import current_app
+from pymongo import ASCENDING, UpdateOne
+
+log = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 2
+DUE_FORMAT = "%Y-%m-%d"
+PROGRESS_ID = f"task_schema_v{SCHEMA_VERSION}"
+RETRY_PASSES = 3
+
+importance_rank = {"Low": 1, "Medium": 2, "High": 3}
+
+
+def importance_rank_for(importance: str | None) -> int:
+    return importance_rank.get(importance or "Low", 0)
+
+
+def parse_due(value) -> datetime | None:
+    """Accept a stored/posted due date in any historical shape; return a UTC midnight datetime."""
+    if isinstance(value, datetime):
+        return datetime.combine(value.date(), datetime.min.time())
+    if isinstance(value, date):
+        return datetime.combine(value, datetime.min.time())
+    if isinstance(value, str) and value.strip():
+        try:
+            return datetime.strptime(value.strip(), DUE_FORMAT)
+        except ValueError:
+            return None
+    return None
+
+
+def _int_1_5(value, default: int = 1) -> int:
+    try:
+        return max(1, min(5, int(value)))
+    except (TypeError, ValueError):
+        return default
+
+
+def normalize_task_fields(fields: dict) -> dict:
+    """Coerce the task fields present in `fields` to their schema types."""
+    out = dict(fields)
+    if "due_date" in out:
+        out["due_date"] = parse_due(out["due_date"])
+    for key in ("complexity", "energy"):
+        if key in out:
+            out[key] = _int_1_5(out[key])
+    if "completed" in out:
+        out["completed"] = bool(out["completed"])
+    if "importance" in out:
+        if out["importance"] not in importance_rank:
+            out["importance"] = "Low"
+        out["importance_rank"] = importance_rank_for(out["importance"])
+    return out
+
+
+# Fields upgrade_task_doc() rewrites; the migration only writes if they still hold what it read.
+_UPGRADED_FIELDS = ("due_date", "complexity", "energy", "completed", "importance")
+
+
+def upgrade_task_doc(doc: dict) -> dict:
+    """Return the $set needed to bring a stored task to SCHEMA_VERSION."""
+    updates = normalize_task_fields(
+        {
+            "due_date": doc.get("due_date"),
+            "complexity": doc.get("complexity", 1),
+            "energy": doc.get("energy", 1),
+            "completed": doc.get("completed", False),
+            "importance": doc.get("importance", "Low"),
+        }
+    )
+    updates["schema_version"] = SCHEMA_VERSION
+    return updates
+
+
+# -----------------------
+#  Background upgrade
+# -----------------------
+def task_schema_progress() -> dict:
+    state = current_app.migration_progress.find_one({"_id": PROGRESS_ID}) or {}
+    total = current_app.tasks.estimated_document_count()
+    pending = current_app.tasks.count_documents({"schema_version": {"$ne": SCHEMA_VERSION}})
+    return {
+        "version": SCHEMA_VERSION,
+        "total": total,
+        "pending": pending,
+        "migrated": state.get("migrated", 0),
+        "started_at": state.get("started_at"),
+        "finished_at": state.get("finished_at"),
+    }
+
+
+def migrate_task_schema(batch_size: int = 500, max_batches: int | None = None) -> dict:
+    """Upgrade tasks to SCHEMA_VERSION in `_id` order, one batch at a time.
+
+    Safe to interrupt and re-run: it resumes after the last upgraded `_id`.
+    Each write is guarded on the old version and on the field values it was
+    computed from, so a task edited or toggled after the batch was read is
+    never overwritten with stale values; skipped tasks are retried in up to
+    ``RETRY_PASSES`` further passes from the start.
+    """
+    progress = current_app.migration_progress
+    state = progress.find_one({"_id": PROGRESS_ID})
+    if not state:
+        state = {"_id": PROGRESS_ID, "last_id": None, "migrated": 0, "started_at": datetime.utcnow()}
+        progress.insert_one(state)
+
+    last_id = state.get("last_id")
+    migrated = state.get("migrated", 0)
+    batches = skipped = passes = 0
+
+    while max_batches is None or batches < max_batches:
+        query = {"schema_version": {"$ne": SCHEMA_VERSION}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        docs = list(current_app.tasks.find(query).sort("_id", ASCENDING).limit(batch_size))
+        if not docs:
+            if skipped and passes < RETRY_PASSES:
+                # tasks changed under a batch were skipped; go over them again
+                last_id, skipped, passes = None, 0, passes + 1
+                continue
+            progress.update_one({"_id": PROGRESS_ID}, {"$set": {"finished_at": datetime.utcnow()}})
+            break
+
+        ops = [
+            UpdateOne(
+                {
+                    "_id": d["_id"],
+                    "schema_version": {"$ne": SCHEMA_VERSION},
+                    # missing fields match as null, so untouched documents still qualify
+                    **{k: d.get(k) for k in _UPGRADED_FIELDS},
+                },
+                {"$set": upgrade_task_doc(d)},
+            )
+            for d in docs
+        ]
+        result = current_app.tasks.bulk_write(ops, ordered=False)
+
+        last_id = docs[-1]["_id"]
+        migrated += result.modified_count
+        skipped += len(ops) - result.matched_count
+        batches += 1
+        progress.update_one(
+            {"_id": PROGRESS_ID},
+            {"$set": {"last_id": last_id, "migrated": migrated, "updated_at": datetime.utcnow()}},
+        )
+        log.info("Task schema v%s: %s task(s) upgraded so far", SCHEMA_VERSION, migrated)
+
+    return task_schema_progress()
@@ -0,0 +1,159 @@
+"""Compact task objects for pages.
+
+``TaskView`` is built straight from a projected task document and uses
+``__slots__``, so a page holding thousands of tasks keeps one small object per
+task instead of a dict (plus a second, enriched copy). Derived fields are
+computed on first access and remembered:
+
+- ``due_date`` (form/template string) from ``due``
+- ``due_status`` / ``days_left`` / ``importance_code`` once ``bind()`` has
+  supplied today's date
+- ``focus_minutes`` / ``focus_sessions`` / ``project_name`` from the rollup and
+  project maps passed to ``bind()``
+"""
+
+from __future__ import annotations
+
+from datetime import date, datetime
+
+from model.task_schema import DUE_FORMAT
+
+_IMPORTANCE_CODES = {"High": "high", "Medium": "med"}
+SOON_DAYS = 3
+
+# Fields needed to build a TaskView.
+TASK_PROJECTION = {
+    "user_id": 1,
+    "project_id": 1,
+    "tags": 1,
+    "title": 1,
+    "description": 1,
+    "due_date": 1,
+    "importance": 1,
+    "complexity": 1,
+    "energy": 1,
+    "completed": 1,
+    "archived_at": 1,
+}
+
+
+class TaskView:
+    __slots__ = (
+        "id",
+        "user_id",
+        "project_id",
+        "tags",
+        "title",
+        "description",
+        "due",
+        "importance",
+        "complexity",
+        "energy",
+        "completed",
+        "archived",
+        "priority",
+        "_due_date",
+        "_status",
+        "_days_left",
+        "_today",
+        "_focus",
+        "_project_names",
+    )
+
+    def __init__(self, doc: dict):
+        due = doc.get("due_date")
+        self.id = str(doc["_id"])
+        self.user_id = doc.get("user_id")
+        self.project_id = doc.get("project_id")
+        self.tags = doc.get("tags", [])
+        self.title = doc.get("title", "")
+        self.description = doc.get("description", "")
+        self.due = due.date() if isinstance(due, datetime) else None
+        self.importance = doc.get("importance", "Low")
+        self.complexity = doc.get("complexity", 1)
+        self.energy = doc.get("energy", 1)
+        self.completed = doc.get("completed", False)
+        # read from tasks_archive (see model/archive_model.py)
+        self.archived = "archived_at" in doc
+        # {profile: score}, only loaded where lists are ranked (see model/priority_model.py)
+        self.priority = doc.get("priority")
+        # pre-v2 documents may still hold the due date as a string
+        self._due_date = due if isinstance(due, str) else None
+        self._status = None
+        self._days_left = None
+        self._today = None
+        self._focus = None
+        self._project_names = None
+
+    def bind(self, today: date, focus: dict | None = None, project_names: dict | None = None) -> "TaskView":
+        """Attach page context (no copying); derived fields are computed when first read."""
+        self._today = today
+        self._status = self._days_left = None
+        self._focus = focus
+        self._project_names = project_names
+        return self
+
+    @property
+    def due_date(self) -> str:
+        if self._due_date is None:
+            self._due_date = self.due.strftime(DUE_FORMAT) if self.due else ""
+        return self._due_date
+
+    @property
+    def due_sort_key(self) -> date:
+        """Orders like the `due_date` string ("" first) without building the string."""
+        if self.due:
+            return self.due
+        if self._due_date:
+            try:
+                return datetime.strptime(self._due_date, DUE_FORMAT).date()
+            except ValueError:
+                pass
+        return date.min
+
+    @property
+    def due_status(self) -> str:
+        if self._status is None:
+            if not self.due:
+                self._status = "none"
+            else:
+                delta = self._days_left = (self.due - self._today).days
+                if delta < 0:
+                    self._status = "overdue"
+                elif delta == 0:
+                    self._status = "today"
+                elif delta <= SOON_DAYS:
+                    self._status = "soon"
+                else:
+                    self._status = "later"
+        return self._status
+
+    @property
+    def days_left(self) -> int | None:
+        self.due_status
+        return self._days_left
+
+    @property
+    def is_urgent(self) -> bool:
+        return self.due_status in ("overdue", "today", "soon")
+
+    @property
+    def importance_code(self) -> str:
+        return _IMPORTANCE_CODES.get(self.importance, "low")
+
+    @property
+    def focus_minutes(self) -> int:
+        return (self._focus or {}).get(self.id, {}).get("minutes", 0)
+
+    @property
+    def focus_sessions(self) -> int:
+        return (self._focus or {}).get(self.id, {}).get("sessions", 0)
+
+    @property
+    def project_name(self) -> str:
+        if not self.project_id:
+            return "No project"
+        return (self._project_names or {}).get(self.project_id, "No project")
+
+    def __repr__(self) -> str:
+        return f"TaskView({self.id!r}, {self.title!r})"
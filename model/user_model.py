@@ -1,10 +1,41 @@
+from datetime import datetime
+
 from flask import current_app
-from utils.security import hash_password, verify_password
+from pymongo.errors import DuplicateKeyError
+
+from utils.security import KEY_LEN, SALT_LEN, HashingBusy, current_kdf, hash_password, needs_rehash, verify_password
+from model.tag_model import DEFAULT_TAGS, ensure_tags_exist
+
+# Fields authentication and the session need; one indexed lookup returns all of them.
+AUTH_PROJECTION = {"email": 1, "name": 1, "password_hash": 1, "salt": 1, "kdf": 1, "password": 1}
+
+# Hashed against when the email is unknown, so a miss costs as much as a wrong password.
+_DUMMY_SALT = "00" * SALT_LEN
+_DUMMY_HASH = "00" * KEY_LEN
+
+# Built by migration 1 in the background, so it may not exist yet on a fresh deploy.
+EMAIL_INDEX = "email_unique"
+
+
+def email_index_ready() -> bool:
+    """True once the unique email index exists (remembered per app after the first hit)."""
+    if current_app.extensions.get(EMAIL_INDEX):
+        return True
+    info = current_app.users.index_information().get(EMAIL_INDEX)
+    ready = bool(info and info.get("unique"))
+    if ready:
+        current_app.extensions[EMAIL_INDEX] = True
+    return ready
 
 
 def create_user(name: str, email: str, password: str):
     """
     Insert a new user with salted+peppered hash.
+
+    Returns the new user id, or None if the email is already registered
+    (enforced by the unique `email` index, so concurrent sign-ups cannot race).
+    Until that index exists, registration checks for the email before and
+    after inserting and backs out on a duplicate, failing closed.
     """
     email = email.lower().strip()
 
@@ -15,73 +46,94 @@ def create_user(name: str, email: str, password: str):
         "email": email,
         "password_hash": hashed["hash"],
         "salt": hashed["salt"],
+        "kdf": hashed["kdf"],
     }
 
-    result = current_app.users.insert_one(user)
+    indexed = email_index_ready()
+    if not indexed and current_app.users.find_one({"email": email}, {"_id": 1}):
+        return None
+    try:
+        result = current_app.users.insert_one(user)
+    except DuplicateKeyError:
+        return None
+    if not indexed and current_app.users.count_documents({"email": email}, limit=2) > 1:
+        # A concurrent sign-up slipped in between the check and the insert.
+        current_app.users.delete_one({"_id": result.inserted_id})
+        return None
     user_id = str(result.inserted_id)
 
-    # Create default settings for this user (pomodoro defaults)
-    current_app.settings.update_one(
-        {"user_id": user_id},
-        {
-            "$setOnInsert": {
-                "user_id": user_id,
-                "focus_minutes": 25,
-                "break_minutes": 5,
-                "long_break_minutes": 15,
-                "sessions_before_long_break": 4,
-            }
-        },
-        upsert=True,
-    )
-
-    # Create a "Personal" project so tasks can be grouped immediately
-    current_app.projects.update_one(
-        {"user_id": user_id, "name": "Personal"},
-        {
-            "$setOnInsert": {
-                "user_id": user_id,
-                "name": "Personal",
-                "created_at": None,
-            }
-        },
-        upsert=True,
-    )
+    # No settings document is written: reads fall back to the defaults in
+    # model/settings_model.py and the first save upserts one.
 
-    return user_id
+    # The user is brand new, so plain inserts are enough (no upsert lookups).
+    current_app.projects.insert_one({"user_id": user_id, "name": "Personal", "created_at": datetime.utcnow()})
 
+    # Default tags are provisioned once, here, instead of on every /addtask
+    ensure_tags_exist(user_id, DEFAULT_TAGS)
 
-def find_user_by_email(email: str):
-    email = email.lower().strip()
-    return current_app.users.find_one({"email": email})
+    return user_id
 
 
-def verify_user(email: str, password: str) -> bool:
+def authenticate(email: str, password: str):
     """
-    Verify user credentials.
+    Verify user credentials and return the user document, or None.
 
     Supports:
     - NEW users: with `salt` + `password_hash` (hashed & peppered)
     - OLD users (before security update): with plain `password` field
       (so the app doesn't crash with KeyError)
     """
-    user = find_user_by_email(email)
+    user = current_app.users.find_one({"email": email.lower().strip()}, AUTH_PROJECTION)
     if not user:
-        return False
+        # same KDF work as a known email, so timing does not reveal who is registered
+        verify_password(password, salt_hex=_DUMMY_SALT, stored_hash=_DUMMY_HASH, kdf=current_kdf())
+        return None
 
     # --- New style: hashed password with salt+pepper ---
     if "salt" in user and "password_hash" in user:
-        return verify_password(
+        ok = verify_password(
             password,
             salt_hex=user["salt"],
             stored_hash=user["password_hash"],
+            kdf=user.get("kdf"),
         )
 
     # --- Legacy style: plain-text password (old accounts) ---
     # This is just here so your project doesn't crash on old data.
     # New accounts created via /register will NOT use this anymore.
-    if "password" in user:
-        return user["password"] == password
+    elif "password" in user:
+        ok = user["password"] == password
 
     # If neither format is present, fail safely
-    return False
+    else:
+        ok = False
+
+    if not ok:
+        return None
+    if "password" in user or needs_rehash(user.get("kdf")):
+        _rehash(user, password)
+    return user
+
+
+def _rehash(user: dict, password: str):
+    """Upgrade a legacy / outdated hash now that we know the password.
+
+    Skipped when the hashing pool is busy; the next login tries again.
+    """
+    try:
+        hashed = hash_password(password)
+    except HashingBusy:
+        return
+    # Guard on the old hash so a concurrent password change is never overwritten.
+    guard = {"_id": user["_id"]}
+    if "password_hash" in user:
+        guard["password_hash"] = user["password_hash"]
+    else:
+        guard["password"] = user["password"]
+    current_app.users.update_one(
+        guard,
+        {
+            "$set": {"password_hash": hashed["hash"], "salt": hashed["salt"], "kdf": hashed["kdf"]},
+            "$unset": {"password": ""},
+        },
+    )
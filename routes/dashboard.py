@@ -1,165 +1,174 @@
 from __future__ import annotations
 
-from datetime import datetime, date
-from collections import defaultdict
+from datetime import datetime, date, timedelta
 
-from flask import Blueprint, render_template, session, current_app
+from flask import Blueprint, jsonify, render_template, session
 
-from model.task_model import get_tasks_for_dashboard
+from model.task_model import due_buckets, task_counts
+from model.focus_model import focus_by_task
 from model.project_model import list_projects
+from model.archive_model import archived_task_counts
+from model.priority_model import plan_profile, profile_bucket, refresh_priorities, top_tasks
+from model.task_buckets import Bucket, bucketize
+from model.task_view import SOON_DAYS
 from utils.auth import login_required
+from utils.conditional import versioned_json
 
 dashboard_bp = Blueprint("dashboard_bp", __name__)
 
+# tasks shown per suggestion list
+LIST_LIMITS = {"suggested": 6, "quick_wins": 4, "big_rocks": 4, "neglected_urgent": 4}
+
+
+def _due_bucket(name: str, first: date, last: date | None = None, limit: int = 5) -> Bucket:
+    """Open tasks due in [first, last] (or before `first` without `last`), earliest first."""
+
+    def when(t) -> bool:
+        if t.completed or t.due is None:
+            return False
+        return t.due < first if last is None else first <= t.due <= last
+
+    return Bucket(name, when=when, key=lambda t: t.due, k=limit, largest=False)
+
+
+def dashboard_buckets(mood: str, today: date, due_limit: int = 5) -> list[Bucket]:
+    """Every dashboard list, the due-date buckets and the open count as one ``bucketize`` pass.
+
+    ``due_limit=0`` only counts the due-date buckets.
+    """
+    plan = plan_profile(mood)
+    return [
+        *(profile_bucket(plan if name == "suggested" else name, k, name) for name, k in LIST_LIMITS.items()),
+        _due_bucket("overdue", today, limit=due_limit),
+        _due_bucket("today", today, today, limit=due_limit),
+        _due_bucket("soon", today + timedelta(days=1), today + timedelta(days=SOON_DAYS), limit=due_limit),
+        Bucket("open", when=lambda t: not t.completed),
+    ]
+
+
+# -----------------------
+#  Sections
+# -----------------------
+def _lists(user_id: str, mood: str, today: date, names: tuple, due_limit: int = 5) -> dict:
+    """{name: {"count", "tasks"}} for the named dashboard lists / buckets (see ``dashboard_buckets``).
+
+    Each suggestion list is the top of one stored priority score (see
+    model/priority_model.py): a bounded index scan. When the open tasks were
+    just rescored for the day anyway, the requested lists come from one
+    ``bucketize`` pass over them instead.
+    """
+    scored = refresh_priorities(user_id, today)
+    if scored is not None:
+        lists = bucketize(scored, [b for b in dashboard_buckets(mood, today, due_limit) if b.name in names])
+        return {name: {"count": r.count, "tasks": r.items} for name, r in lists.items()}
+
+    plan = plan_profile(mood)
+    out = {
+        name: {"tasks": top_tasks(user_id, plan if name == "suggested" else name, k)}
+        for name, k in LIST_LIMITS.items()
+        if name in names
+    }
+    if {"overdue", "today", "soon"} & set(names):
+        # overdue / today / soon come straight from indexed due-date range queries
+        out.update(due_buckets(user_id, today, limit=due_limit))
+    if "open" in names:
+        out["open"] = {"count": task_counts(user_id)["open"], "tasks": []}
+    return out
+
+
+def _bind_shown(user_id: str, today: date, lists: dict):
+    """Bind only the tasks a section shows to today's date, their focus rollups and project names."""
+    shown = [t for bucket in lists.values() for t in bucket["tasks"]]
+    if not shown:
+        return
+    project_name = {p["id"]: p["name"] for p in list_projects(user_id)}
+    focus = focus_by_task(user_id, list({t.id for t in shown}))
+    for t in shown:
+        t.bind(today, focus, project_name)
+
+
+def _kpis_section(user_id: str, mood: str, today: date) -> dict:
+    lists = _lists(user_id, mood, today, ("overdue", "today", "soon", "open"), due_limit=0)
+    return {
+        "kpis": {
+            "open": lists["open"]["count"],
+            "done": task_counts(user_id)["done"] + archived_task_counts(user_id)["tasks"],
+            "overdue": lists["overdue"]["count"],
+            "due_soon": lists["today"]["count"] + lists["soon"]["count"],
+        }
+    }
 
-def _parse_due(due_str: str):
-    if not due_str:
-        return None
-    try:
-        return datetime.strptime(due_str, "%Y-%m-%d").date()
-    except Exception:
-        return None
 
+def _plan_section(user_id: str, mood: str, today: date) -> dict:
+    # Suggested focus plan (weighted for today's mood)
+    lists = _lists(user_id, mood, today, ("suggested",))
+    _bind_shown(user_id, today, lists)
+    return {"suggested": lists["suggested"]["tasks"]}
 
-def _due_status(d: date | None, today: date):
-    if not d:
-        return "none", None
-    delta = (d - today).days
-    if delta < 0:
-        return "overdue", delta
-    if delta == 0:
-        return "today", 0
-    if 1 <= delta <= 3:
-        return "soon", delta
-    return "later", delta
 
+def _attention_section(user_id: str, mood: str, today: date) -> dict:
+    lists = _lists(user_id, mood, today, ("overdue", "today", "soon"))
+    _bind_shown(user_id, today, lists)
+    return {
+        "overdue": lists["overdue"]["tasks"],
+        "due_today": lists["today"]["tasks"],
+        "due_soon": lists["soon"]["tasks"],
+    }
 
-def _importance_class(importance: str):
-    if importance == "High":
-        return "high"
-    if importance == "Medium":
-        return "med"
-    return "low"
 
+def _suggestions_section(user_id: str, mood: str, today: date) -> dict:
+    # Quick wins: low complexity + urgent; big rocks: highest complexity;
+    # neglected but urgent: 0 focus minutes and due soon/today
+    lists = _lists(user_id, mood, today, ("quick_wins", "big_rocks", "neglected_urgent"))
+    _bind_shown(user_id, today, lists)
+    return {name: lists[name]["tasks"] for name in ("quick_wins", "big_rocks", "neglected_urgent")}
 
-@dashboard_bp.route("/dashboard")
-@login_required
-def dashboard():
-    user_id = session.get("user_id")
 
-    mood = session.get("current_mood", "focused")
-    mood_labels = {
-        "energetic": "⚡ Energetic",
-        "focused": "🎯 Focused",
-        "calm": "😊 Calm",
-        "creative": "✨ Creative",
-    }
-    mood_label = mood_labels.get(mood, "🎯 Focused")
+# section -> builder; each renders templates/dashboard_<section>.html
+SECTIONS = {
+    "kpis": _kpis_section,
+    "plan": _plan_section,
+    "attention": _attention_section,
+    "suggestions": _suggestions_section,
+}
 
-    tasks = get_tasks_for_dashboard(user_id=user_id, mood=mood)
 
-    projects = list_projects(user_id)
-    project_name = {p["id"]: p["name"] for p in projects}
+def render_section(user_id: str, section: str, mood: str, today: date) -> str:
+    """The section's HTML."""
+    return render_template(f"dashboard_{section}.html", **SECTIONS[section](user_id, mood, today))
 
-    # focus aggregation per task
-    focus_docs = list(current_app.focus_sessions.find({"user_id": user_id}))
-    focus_minutes_by_task = defaultdict(int)
-    focus_sessions_by_task = defaultdict(int)
-    for s in focus_docs:
-        tid = s.get("task_id")
-        if tid:
-            focus_minutes_by_task[tid] += int(s.get("minutes", 0) or 0)
-            focus_sessions_by_task[tid] += 1
 
-    today = datetime.utcnow().date()
+MOOD_LABELS = {
+    "energetic": "⚡ Energetic",
+    "focused": "🎯 Focused",
+    "calm": "😊 Calm",
+    "creative": "✨ Creative",
+}
 
-    enriched = []
-    for t in tasks:
-        due = _parse_due(t.get("due_date", ""))
-        status, days_left = _due_status(due, today)
-
-        tid = t.get("id")
-        focus_min = focus_minutes_by_task.get(tid, 0)
-        focus_cnt = focus_sessions_by_task.get(tid, 0)
-
-        pid = t.get("project_id")
-        p_name = project_name.get(pid, "No project") if pid else "No project"
-
-        importance = t.get("importance", "Low")
-        imp_code = _importance_class(importance)
-
-        enriched.append(
-            {
-                **t,
-                "project_name": p_name,
-                "due_status": status,
-                "days_left": days_left,
-                "focus_minutes": focus_min,
-                "focus_sessions": focus_cnt,
-                "importance_code": imp_code,
-            }
-        )
-
-    open_tasks = [t for t in enriched if not t.get("completed")]
-    done_tasks = [t for t in enriched if t.get("completed")]
-
-    overdue = [t for t in open_tasks if t["due_status"] == "overdue"]
-    due_today = [t for t in open_tasks if t["due_status"] == "today"]
-    due_soon = [t for t in open_tasks if t["due_status"] == "soon"]
-
-    # ---------- Suggested focus plan ----------
-    suggested = sorted(
-        open_tasks,
-        key=lambda x: (
-            0 if x["due_status"] in ("overdue", "today", "soon") else 1,
-            0 if x.get("importance") == "High" else 1,
-            x.get("due_date", "9999-12-31"),
-        ),
-    )[:6]
-
-    # ---------- NEW: Smart suggestions that ALWAYS have meaning ----------
-    # Quick wins: low complexity + urgent
-    quick_wins = sorted(
-        [t for t in open_tasks if t["due_status"] in ("overdue", "today", "soon") and int(t.get("complexity", 1)) <= 2],
-        key=lambda x: (0 if x["due_status"] == "overdue" else 1, x.get("due_date", "9999-12-31")),
-    )[:4]
-
-    # Big rocks: highest complexity tasks (these matter even if low/medium importance)
-    big_rocks = sorted(
-        [t for t in open_tasks],
-        key=lambda x: (int(x.get("complexity", 1)), 0 if x["due_status"] in ("overdue", "today", "soon") else 1),
-        reverse=True,
-    )[:4]
-
-    # Neglected but urgent: 0 focus minutes and due soon/today
-    neglected_urgent = sorted(
-        [t for t in open_tasks if (t.get("focus_minutes", 0) == 0) and t["due_status"] in ("overdue", "today", "soon")],
-        key=lambda x: (0 if x["due_status"] == "overdue" else 1, x.get("due_date", "9999-12-31")),
-    )[:4]
-
-    # Keep your original sections too (still useful)
-    high_priority = [t for t in open_tasks if t.get("importance") == "High"][:5]
-    neglected = [t for t in open_tasks if (t.get("focus_minutes", 0) == 0)][:5]
-
-    kpis = {
-        "open": len(open_tasks),
-        "done": len(done_tasks),
-        "overdue": len(overdue),
-        "due_soon": len(due_today) + len(due_soon),
-    }
 
+@dashboard_bp.route("/dashboard")
+@login_required
+def dashboard():
+    """The page shell; every section is fetched from /api/dashboard/<section> (static/dashboard.js)."""
+    mood = session.get("current_mood", "focused")
     return render_template(
         "dashboard.html",
         user_name=session.get("user_name", "User"),
-        mood_label=mood_label,
-        kpis=kpis,
-        suggested=suggested,
-        overdue=overdue[:5],
-        due_today=due_today[:5],
-        due_soon=due_soon[:5],
-        high_priority=high_priority,
-        neglected=neglected,
-        quick_wins=quick_wins,
-        big_rocks=big_rocks,
-        neglected_urgent=neglected_urgent,
+        mood_label=MOOD_LABELS.get(mood, "🎯 Focused"),
     )
+
+
+@dashboard_bp.route("/api/dashboard/<section>")
+@login_required
+def dashboard_section(section: str):
+    if section not in SECTIONS:
+        return jsonify({"ok": False, "error": "unknown section"}), 404
+    user_id = session.get("user_id")
+    mood = session.get("current_mood", "focused")
+    today = datetime.utcnow().date()
+
+    def build():
+        return {"ok": True, "section": section, "html": render_section(user_id, section, mood, today)}
+
+    # cached under the data version the ETag is made from
+    return versioned_json(f"dashboard-{section}", user_id, build, mood, today, cache=True)
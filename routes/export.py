@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import csv
+import io
+import json
+from datetime import datetime
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from flask import Blueprint, Response, request, session, jsonify
+
+from utils.auth import login_required
+from model.export_model import EXPORTS, export_cursor
+
+export_bp = Blueprint("export_bp", __name__)
+
+# rows per chunk written to the response
+CHUNK_ROWS = 200
+
+
+def _plain(value):
+    """Make a stored value JSON/CSV friendly (ObjectId -> str, datetime -> ISO 8601)."""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_plain(v) for v in value]
+    return value
+
+
+def _ndjson(cursor):
+    lines = []
+    for doc in cursor:
+        lines.append(json.dumps(_plain(doc), separators=(",", ":"), ensure_ascii=False))
+        if len(lines) >= CHUNK_ROWS:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def _csv_cell(value):
+    value = _plain(value)
+    if isinstance(value, list):
+        return ";".join(str(v) for v in value)
+    if isinstance(value, dict):
+        return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+    return "" if value is None else value
+
+
+def _csv(cursor, fields: list[str]):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(fields)
+    rows = 0
+    for doc in cursor:
+        writer.writerow([_csv_cell(doc.get(f)) for f in fields])
+        rows += 1
+        if rows % CHUNK_ROWS == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+@export_bp.route("/api/export/<kind>")
+@login_required
+def export(kind: str):
+    """Stream the user's data: ?format=ndjson|csv, ?after=<last _id seen> to resume."""
+    if kind not in EXPORTS:
+        return jsonify({"ok": False, "error": "unknown_export"}), 404
+
+    fmt = request.args.get("format", "ndjson")
+    if fmt not in ("ndjson", "csv"):
+        return jsonify({"ok": False, "error": "invalid_format"}), 400
+
+    after = request.args.get("after")
+    if after:
+        try:
+            after = ObjectId(after)
+        except (InvalidId, TypeError):
+            return jsonify({"ok": False, "error": "invalid_after"}), 400
+
+    cursor = export_cursor(session["user_id"], kind, after or None)
+    if fmt == "csv":
+        body, mimetype = _csv(cursor, EXPORTS[kind][1]), "text/csv"
+    else:
+        body, mimetype = _ndjson(cursor), "application/x-ndjson"
+
+    resp = Response(body, mimetype=mimetype)
+    resp.headers["Content-Disposition"] = f'attachment; filename="{kind}.{fmt}"'
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
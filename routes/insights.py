@@ -1,13 +1,21 @@
 from __future__ import annotations
 
-from collections import defaultdict
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 
-from flask import Blueprint, render_template, session, jsonify, current_app
+from flask import Blueprint, render_template, request, session, jsonify, current_app
 from utils.auth import login_required
+from utils.conditional import versioned_json
+from model.project_model import project_rollup_stages
+from model.archive_model import add_archived_rollups, archived_task_counts
 
 insights_bp = Blueprint("insights_bp", __name__)
 
+RANGES = (7, 30, 90, 365)
+GRANULARITIES = ("day", "week", "month")
+MAX_RANGE_DAYS = 731
+# The bucket loops step up to a month past the last day; stay clear of date.max.
+LATEST_DAY = date.max - timedelta(days=31)
+
 
 def _col(name: str):
     # Supports both styles: current_app.db["x"] or current_app.x
@@ -16,122 +24,266 @@ def _col(name: str):
     return getattr(current_app, name)
 
 
-def _safe_int(x, default=0):
-    try:
-        return int(x)
-    except Exception:
-        return default
+_COMPLETED = {"$cond": [{"$eq": ["$completed", True]}, 1, 0]}
 
 
-def _insights_payload(user_id: str) -> dict:
-    tasks_col = _col("tasks")
-    focus_col = _col("focus_sessions")
-    break_col = _col("break_sessions")
-    moods_col = _col("moods")
+def _task_facets(user_id: str) -> dict:
+    """Task totals and per-project rollups in one aggregation over the user's tasks."""
+    pipeline = [
+        {"$match": {"user_id": user_id}},
+        {
+            "$facet": {
+                "totals": [
+                    {"$group": {"_id": None, "total": {"$sum": 1}, "completed": {"$sum": _COMPLETED}}},
+                ],
+                "projects": project_rollup_stages(user_id),
+            }
+        },
+    ]
+    return next(_col("tasks").aggregate(pipeline), {"totals": [], "projects": []})
+
+
+def _activity_facets(user_id: str, start: datetime, end: datetime, unit: str) -> dict:
+    """Focus rollups, daily stats, break totals and mood count in one aggregation.
+
+    Focus rollups are unioned with the user's daily stats (one document per
+    active day, see model/stats_model.py) and mood logs, then reduced
+    server-side so only final numbers cross the wire. Only days in [start, end)
+    reach the facet, where the chart series is grouped by ``$dateTrunc``; the
+    all-time break totals are grouped inside their own union first.
+    """
+    pipeline = [
+        {"$match": {"user_id": user_id}},
+        {"$project": {"src": {"$literal": "rollup"}, "task_id": 1, "minutes": 1, "sessions": 1}},
+        {
+            "$unionWith": {
+                "coll": "daily_stats",
+                "pipeline": [
+                    {"$match": {"user_id": user_id, "day": {"$gte": start, "$lt": end}}},
+                    {"$project": {"_id": 0, "src": {"$literal": "day"}, "day": 1, "focus_minutes": 1, "break_minutes": 1}},
+                ],
+            }
+        },
+        {
+            # break totals are all-time: reduced to one document before the facet
+            "$unionWith": {
+                "coll": "daily_stats",
+                "pipeline": [
+                    {"$match": {"user_id": user_id}},
+                    {
+                        "$group": {
+                            "_id": None,
+                            "minutes": {"$sum": "$break_minutes"},
+                            "sessions": {"$sum": "$break_sessions"},
+                        }
+                    },
+                    {"$project": {"_id": 0, "src": {"$literal": "breaks"}, "minutes": 1, "sessions": 1}},
+                ],
+            }
+        },
+        {
+            "$unionWith": {
+                "coll": "moods",
+                "pipeline": [
+                    {"$match": {"user_id": user_id}},
+                    {"$project": {"_id": 0, "src": {"$literal": "mood"}}},
+                ],
+            }
+        },
+        {
+            "$facet": {
+                "focus": [
+                    {"$match": {"src": "rollup"}},
+                    {
+                        "$group": {
+                            "_id": None,
+                            "minutes": {"$sum": "$minutes"},
+                            "sessions": {"$sum": "$sessions"},
+                            "unlinked_minutes": {"$sum": {"$cond": [{"$ifNull": ["$task_id", False]}, 0, "$minutes"]}},
+                            "unlinked_sessions": {"$sum": {"$cond": [{"$ifNull": ["$task_id", False]}, 0, "$sessions"]}},
+                        }
+                    },
+                ],
+                "top_tasks": [
+                    {"$match": {"src": "rollup", "task_id": {"$ne": None}}},
+                    # ties in first-seen order, like the per-session loop this replaced
+                    {"$sort": {"minutes": -1, "first_session_id": 1, "_id": 1}},
+                    {"$limit": 8},
+                    {
+                        "$lookup": {
+                            "from": "tasks",
+                            "let": {
+                                "oid": {"$convert": {"input": "$task_id", "to": "objectId", "onError": None, "onNull": None}}
+                            },
+                            "pipeline": [
+                                {"$match": {"user_id": user_id, "$expr": {"$eq": ["$_id", "$$oid"]}}},
+                                {"$project": {"_id": 0, "title": 1, "project_id": 1}},
+                            ],
+                            "as": "task",
+                        }
+                    },
+                    {
+                        "$lookup": {
+                            "from": "tasks_archive",
+                            "let": {
+                                "oid": {"$convert": {"input": "$task_id", "to": "objectId", "onError": None, "onNull": None}}
+                            },
+                            "pipeline": [
+                                {"$match": {"user_id": user_id, "$expr": {"$eq": ["$_id", "$$oid"]}}},
+                                {"$project": {"_id": 0, "title": 1, "project_id": 1}},
+                            ],
+                            "as": "archived_task",
+                        }
+                    },
+                ],
+                "breaks": [{"$match": {"src": "breaks"}}],
+                "series": [
+                    {"$match": {"src": "day"}},
+                    {
+                        "$group": {
+                            "_id": {"$dateTrunc": {"date": "$day", "unit": unit, "startOfWeek": "monday"}},
+                            "focus_minutes": {"$sum": "$focus_minutes"},
+                            "break_minutes": {"$sum": "$break_minutes"},
+                        }
+                    },
+                ],
+                "moods": [{"$match": {"src": "mood"}}, {"$count": "logs"}],
+            }
+        },
+    ]
+    return next(_col("focus_rollups").aggregate(pipeline), {})
+
+
+def _first(facet: list, default: dict) -> dict:
+    return facet[0] if facet else default
+
+
+def _chart_window(args, today: date) -> tuple[date, date, str]:
+    """(first day, last day, granularity) from ?range=7|30|90|365 or ?from=&to=, and ?granularity=.
+
+    Raises ValueError with an error code for unusable parameters.
+    """
+    unit = args.get("granularity", "day")
+    if unit not in GRANULARITIES:
+        raise ValueError("invalid_granularity")
+
+    if args.get("from") or args.get("to"):
+        try:
+            first = datetime.strptime(args.get("from", ""), "%Y-%m-%d").date()
+            last = datetime.strptime(args.get("to") or today.isoformat(), "%Y-%m-%d").date()
+        except ValueError:
+            raise ValueError("invalid_range") from None
+        if last < first or (last - first).days >= MAX_RANGE_DAYS or last >= LATEST_DAY:
+            raise ValueError("invalid_range")
+        return first, last, unit
+
+    span = args.get("range", 7, type=int)
+    if span not in RANGES:
+        raise ValueError("invalid_range")
+    return today - timedelta(days=span - 1), today, unit
+
+
+def _bucket_starts(first: date, last: date, unit: str) -> list[date]:
+    """Start date of every bucket overlapping [first, last], matching $dateTrunc."""
+    if unit == "week":
+        current, step = first - timedelta(days=first.weekday()), timedelta(days=7)
+    elif unit == "day":
+        current, step = first, timedelta(days=1)
+    else:
+        out, current = [], first.replace(day=1)
+        while current <= last:
+            out.append(current)
+            current = (current + timedelta(days=32)).replace(day=1)
+        return out
+    out = []
+    while current <= last:
+        out.append(current)
+        current += step
+    return out
+
+
+def _bucket_label(start: date, unit: str, span_days: int) -> str:
+    if unit == "month":
+        return start.strftime("%b %Y")
+    if unit == "day" and span_days <= 7:
+        return start.strftime("%a")
+    return start.strftime("%b %d")
+
+
+def _insights_payload(user_id: str, first: date | None = None, last: date | None = None, unit: str = "day") -> dict:
     projects_col = _col("projects")
 
-    # -------- Tasks summary --------
-    total = tasks_col.count_documents({"user_id": user_id})
-    completed = tasks_col.count_documents({"user_id": user_id, "completed": True})
+    today = datetime.utcnow().date()
+    last = last or today
+    first = first or last - timedelta(days=6)
+    buckets = _bucket_starts(first, last, unit)
+    labels = [_bucket_label(b, unit, (last - first).days + 1) for b in buckets]
+    start = datetime.combine(first, datetime.min.time())
+    end = datetime.combine(last + timedelta(days=1), datetime.min.time())
+
+    task_facets = _task_facets(user_id)
+    activity = _activity_facets(user_id, start, end, unit)
+    archived = archived_task_counts(user_id)
+
+    # -------- Tasks summary (archived tasks are all completed) --------
+    task_totals = _first(task_facets.get("totals", []), {"total": 0, "completed": 0})
+    total = task_totals["total"] + archived["tasks"]
+    completed = task_totals["completed"] + archived["tasks"]
     remaining = max(total - completed, 0)
     progress_pct = int(round((completed / total) * 100)) if total > 0 else 0
 
     # -------- Timer sessions totals --------
-    focus_docs = list(focus_col.find({"user_id": user_id}))
-    break_docs = list(break_col.find({"user_id": user_id}))
-
-    focus_minutes = sum(_safe_int(d.get("minutes", 0)) for d in focus_docs)
-    break_minutes = sum(_safe_int(d.get("minutes", 0)) for d in break_docs)
+    focus_total = _first(
+        activity.get("focus", []),
+        {"minutes": 0, "sessions": 0, "unlinked_minutes": 0, "unlinked_sessions": 0},
+    )
+    break_total = _first(activity.get("breaks", []), {"minutes": 0, "sessions": 0})
 
     # -------- Mood logs --------
-    mood_logs_count = moods_col.count_documents({"user_id": user_id})
+    mood_logs_count = _first(activity.get("moods", []), {"logs": 0})["logs"]
 
-    # -------- Chart: last 7 days focus/break minutes --------
-    today = datetime.utcnow().date()
-    days = [(today - timedelta(days=i)) for i in range(6, -1, -1)]
-    labels = [d.strftime("%a") for d in days]
-
-    def sum_by_day(docs):
-        per = {d: 0 for d in days}
-        for doc in docs:
-            dt = doc.get("created_at")
-            if not dt:
-                continue
-            try:
-                day = dt.date()
-            except Exception:
-                continue
-            if day in per:
-                per[day] += _safe_int(doc.get("minutes", 0))
-        return [per[d] for d in days]
-
-    focus_series = sum_by_day(focus_docs)
-    break_series = sum_by_day(break_docs)
-
-    # -------- NEW: Focus by task (so "Link to task" has a purpose) --------
-    task_minutes = defaultdict(int)
-    task_sessions = defaultdict(int)
-    unlinked_minutes = 0
-    unlinked_sessions = 0
-
-    for s in focus_docs:
-        mins = _safe_int(s.get("minutes", 0))
-        tid = s.get("task_id")
-        if tid:
-            task_minutes[tid] += mins
-            task_sessions[tid] += 1
-        else:
-            unlinked_minutes += mins
-            unlinked_sessions += 1
-
-    # Load task titles + project_id for those tasks
-    task_ids = list(task_minutes.keys())
-    task_docs = list(tasks_col.find({"user_id": user_id, "_id": {"$in": [__import__("bson").ObjectId(t) for t in task_ids if _looks_like_objectid(t)]}})) if task_ids else []
-    # If your focus_sessions stores task_id as string (not ObjectId), we also try string matching:
-    task_docs += list(tasks_col.find({"user_id": user_id, "_id": {"$in": []}}))  # no-op, keeps structure stable
-
-    # Because your tasks model converts IDs to strings for templates, in Mongo _id is ObjectId.
-    # We'll map by string(ObjectId).
-    tasks_by_id = {str(d["_id"]): d for d in task_docs}
+    # -------- Chart: focus/break minutes per bucket --------
+    per_bucket = {"focus": {b: 0 for b in buckets}, "break": {b: 0 for b in buckets}}
+    for row in activity.get("series", []):
+        bucket = row["_id"].date()
+        if bucket in per_bucket["focus"]:
+            per_bucket["focus"][bucket] = row.get("focus_minutes", 0)
+            per_bucket["break"][bucket] = row.get("break_minutes", 0)
 
     # Projects map
-    projects = list(projects_col.find({"user_id": user_id}))
+    projects = list(projects_col.find({"user_id": user_id}, {"name": 1}))
     project_name = {str(p["_id"]): p.get("name", "Untitled") for p in projects}
 
+    # -------- NEW: Focus by task (so "Link to task" has a purpose) --------
     top_tasks = []
-    for tid, mins in sorted(task_minutes.items(), key=lambda x: x[1], reverse=True)[:8]:
-        doc = tasks_by_id.get(tid)
+    for row in activity.get("top_tasks", []):
+        found = row.get("task") or row.get("archived_task")
+        doc = found[0] if found else None
         title = doc.get("title") if doc else "Deleted task"
         pid = (doc.get("project_id") if doc else None) or None
         top_tasks.append(
             {
-                "task_id": tid,
+                "task_id": row["task_id"],
                 "title": title,
-                "minutes": mins,
-                "sessions": task_sessions.get(tid, 0),
+                "minutes": row.get("minutes", 0),
+                "sessions": row.get("sessions", 0),
                 "project": project_name.get(pid, "No project") if pid else "No project",
             }
         )
 
     # -------- NEW: Project stats (so Projects feel real) --------
+    by_project = add_archived_rollups({row.pop("_id"): row for row in task_facets.get("projects", [])}, archived)
     project_stats = []
     for p in projects:
         pid = str(p["_id"])
-        p_tasks = list(tasks_col.find({"user_id": user_id, "project_id": pid}))
-        p_total = len(p_tasks)
-        p_done = sum(1 for t in p_tasks if t.get("completed") is True)
-
-        # sum focus minutes for tasks inside this project
-        p_task_ids = {str(t["_id"]) for t in p_tasks}
-        p_focus_minutes = sum(task_minutes.get(tid, 0) for tid in p_task_ids)
-
+        stats = by_project.get(pid, {})
         project_stats.append(
             {
                 "project_id": pid,
                 "name": p.get("name", "Untitled"),
-                "tasks_total": p_total,
-                "tasks_done": p_done,
-                "focus_minutes": p_focus_minutes,
+                "tasks_total": stats.get("tasks_total", 0),
+                "tasks_done": stats.get("tasks_done", 0),
+                "focus_minutes": stats.get("focus_minutes", 0),
             }
         )
 
@@ -145,34 +297,25 @@ def _insights_payload(user_id: str) -> dict:
             "progress_pct": progress_pct,
         },
         "timer": {
-            "focus_minutes": focus_minutes,
-            "focus_sessions": len(focus_docs),
-            "break_minutes": break_minutes,
-            "break_sessions": len(break_docs),
-            "unlinked_focus_minutes": unlinked_minutes,
-            "unlinked_focus_sessions": unlinked_sessions,
+            "focus_minutes": focus_total["minutes"],
+            "focus_sessions": focus_total["sessions"],
+            "break_minutes": break_total["minutes"],
+            "break_sessions": break_total["sessions"],
+            "unlinked_focus_minutes": focus_total["unlinked_minutes"],
+            "unlinked_focus_sessions": focus_total["unlinked_sessions"],
         },
         "mood": {"logs": mood_logs_count},
         "charts": {
             "labels": labels,
-            "focus_minutes": focus_series,
-            "break_minutes": break_series,
+            "focus_minutes": [per_bucket["focus"][b] for b in buckets],
+            "break_minutes": [per_bucket["break"][b] for b in buckets],
+            "range": {"from": first.isoformat(), "to": last.isoformat(), "granularity": unit},
         },
         "top_tasks": top_tasks,
         "projects": project_stats[:8],
     }
 
 
-def _looks_like_objectid(s: str) -> bool:
-    if not isinstance(s, str) or len(s) != 24:
-        return False
-    try:
-        int(s, 16)
-        return True
-    except Exception:
-        return False
-
-
 @insights_bp.route("/insights")
 @login_required
 def insights():
@@ -183,4 +326,13 @@ def insights():
 @login_required
 def insights_api():
     user_id = session.get("user_id")
-    return jsonify(_insights_payload(user_id))
+    today = datetime.utcnow().date()
+    try:
+        first, last, unit = _chart_window(request.args, today)
+    except ValueError as exc:
+        return jsonify({"ok": False, "error": str(exc)}), 400
+
+    def build():
+        return _insights_payload(user_id, first, last, unit)
+
+    return versioned_json("insights", user_id, build, today, first, last, unit, cache=True)
@@ -7,7 +7,8 @@ from flask import (
     session,
 )
 
-from model.user_model import verify_user, create_user, find_user_by_email
+from model.user_model import authenticate, create_user
+from utils.security import HashingBusy
 
 login_bp = Blueprint("login_bp", __name__)
 
@@ -23,13 +24,16 @@ def login():
         password = request.form["password"]
         email_value = email
 
-        if verify_user(email, password):
-            user = find_user_by_email(email)
+        try:
+            user = authenticate(email, password)
+        except HashingBusy:
+            user, error = None, "The server is busy. Please try again in a moment."
+        if user:
             session["user_id"] = str(user["_id"])
             session["user_email"] = user["email"]
             session["user_name"] = user.get("name", "User")
             return redirect(request.args.get("next") or url_for("onboarding_bp.onboarding"))
-        else:
+        elif not error:
             error = "Invalid credentials"
 
     return render_template("login.html", error=error, email=email_value)
@@ -56,14 +60,17 @@ def register():
             error = "Email and password are required."
         elif password != confirm:
             error = "Passwords do not match."
-        elif find_user_by_email(email):
-            error = "An account with that email already exists."
         else:
-            user_id = create_user(name, email, password)
-            session["user_id"] = user_id
-            session["user_email"] = email
-            session["user_name"] = name or "User"
-            return redirect(url_for("onboarding_bp.onboarding"))
+            try:
+                user_id = create_user(name, email, password)
+            except HashingBusy:
+                user_id, error = None, "The server is busy. Please try again in a moment."
+            if user_id:
+                session["user_id"] = user_id
+                session["user_email"] = email
+                session["user_name"] = name or "User"
+                return redirect(url_for("onboarding_bp.onboarding"))
+            error = error or "An account with that email already exists."
 
     return render_template(
         "register.html",
@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, request, redirect, url_for, current_app, session
 from datetime import datetime
 from utils.auth import login_required
+from utils.cache import bump_data_version
 
 onboarding_bp = Blueprint("onboarding_bp", __name__)
 
@@ -19,6 +20,7 @@ def onboarding():
                 "created_at": datetime.utcnow(),
             }
         )
+        bump_data_version(session.get("user_id"))
 
         # Also store in session so we can reuse it on dashboard if we want
         session["current_mood"] = mood
@@ -1,11 +1,22 @@
 from __future__ import annotations
 
-from collections import defaultdict
+from datetime import datetime
 
 from flask import Blueprint, render_template, request, redirect, url_for, session, abort, current_app
 
 from utils.auth import login_required
-from model.project_model import list_projects, get_project, create_project, update_project, delete_project
+from model.project_model import (
+    list_projects,
+    get_project,
+    create_project,
+    update_project,
+    delete_project,
+    project_rollups,
+)
+from model.focus_model import focus_by_task
+from model.archive_model import archived_task_counts
+from model.task_buckets import Bucket, bucketize
+from model.task_view import TaskView
 
 projects_bp = Blueprint("projects_bp", __name__)
 
@@ -22,31 +33,18 @@ def projects_list():
     user_id = session.get("user_id")
     projects = list_projects(user_id)
 
-    tasks_col = _col("tasks")
-    focus_col = _col("focus_sessions")
-
-    # focus per task id (for fast project rollups)
-    focus_docs = list(focus_col.find({"user_id": user_id}))
-    task_focus = defaultdict(int)
-    for s in focus_docs:
-        tid = s.get("task_id")
-        if tid:
-            task_focus[tid] += int(s.get("minutes", 0) or 0)
+    # task counts + focus minutes for every project in one aggregation
+    rollups = project_rollups(user_id)
 
     enriched = []
     for p in projects:
-        pid = p["id"]
-        p_tasks = list(tasks_col.find({"user_id": user_id, "project_id": pid}))
-        total = len(p_tasks)
-        done = sum(1 for t in p_tasks if t.get("completed") is True)
-        # sum focus minutes for tasks in this project
-        focus_minutes = sum(task_focus.get(str(t["_id"]), 0) for t in p_tasks)
+        stats = rollups.get(p["id"], {})
         enriched.append(
             {
                 **p,
-                "tasks_total": total,
-                "tasks_done": done,
-                "focus_minutes": focus_minutes,
+                "tasks_total": stats.get("tasks_total", 0),
+                "tasks_done": stats.get("tasks_done", 0),
+                "focus_minutes": stats.get("focus_minutes", 0),
             }
         )
 
@@ -63,42 +61,39 @@ def project_detail(project_id: str):
         abort(404)
 
     tasks_col = _col("tasks")
-    focus_col = _col("focus_sessions")
-
-    tasks = list(tasks_col.find({"user_id": user_id, "project_id": project_id}))
-
-    # map focus minutes per task
-    focus_docs = list(focus_col.find({"user_id": user_id}))
-    task_focus = defaultdict(int)
-    task_sessions = defaultdict(int)
-
-    for s in focus_docs:
-        tid = s.get("task_id")
-        if tid:
-            task_focus[tid] += int(s.get("minutes", 0) or 0)
-            task_sessions[tid] += 1
 
-    view_tasks = []
-    for t in tasks:
-        tid = str(t["_id"])
-        view_tasks.append(
-            {
-                "id": tid,
-                "title": t.get("title", ""),
-                "completed": bool(t.get("completed")),
-                "due_date": t.get("due_date", ""),
-                "importance": t.get("importance", "Low"),
-                "complexity": t.get("complexity", 1),
-                "focus_minutes": task_focus.get(tid, 0),
-                "focus_sessions": task_sessions.get(tid, 0),
-            }
+    tasks = list(
+        tasks_col.find(
+            {"user_id": user_id, "project_id": project_id},
+            {"title": 1, "completed": 1, "due_date": 1, "importance": 1, "complexity": 1},
         )
+    )
 
-    view_tasks.sort(key=lambda x: (x["completed"], x["due_date"]))
+    # focus rollups for this project's tasks only
+    focus = focus_by_task(user_id, [str(t["_id"]) for t in tasks])
+
+    # one pass: the sorted task list, the done count and the focus total
+    today = datetime.utcnow().date()
+    result = bucketize(
+        (TaskView(t).bind(today, focus) for t in tasks),
+        [
+            Bucket(
+                "tasks",
+                key=lambda x: (bool(x.completed), x.due_sort_key),
+                k=None,
+                largest=False,
+                total=lambda x: x.focus_minutes,
+            ),
+            Bucket("done", when=lambda x: x.completed),
+        ],
+    )
+    view_tasks = result["tasks"].items
 
-    total = len(view_tasks)
-    done = sum(1 for t in view_tasks if t["completed"])
-    focus_total = sum(t["focus_minutes"] for t in view_tasks)
+    # archived tasks are all done; only their counts are read
+    archived = archived_task_counts(user_id)["projects"].get(project_id, {})
+    total = len(view_tasks) + archived.get("tasks", 0)
+    done = result["done"].count + archived.get("tasks", 0)
+    focus_total = result["tasks"].total + archived.get("focus_minutes", 0)
 
     return render_template(
         "project_detail.html",
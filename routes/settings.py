@@ -1,35 +1,12 @@
 from __future__ import annotations
 
-from flask import Blueprint, render_template, request, redirect, url_for, session, jsonify, current_app, flash
+from flask import Blueprint, render_template, request, redirect, url_for, session, jsonify, flash
 from utils.auth import login_required
+from utils.conditional import hashed_json
+from model.settings_model import DEFAULTS, get_settings, save_settings
 
 settings_bp = Blueprint("settings_bp", __name__)
 
-DEFAULTS = {
-    "focus_minutes": 25,
-    "break_minutes": 5,
-    "long_break_minutes": 15,
-    "sessions_before_long_break": 4,
-    "theme": "light",
-}
-
-
-def _get_settings(user_id: str) -> dict:
-    doc = current_app.settings.find_one({"user_id": user_id}) or {}
-    out = dict(DEFAULTS)
-    for k in DEFAULTS:
-        if doc.get(k) is not None:
-            out[k] = doc.get(k)
-    return out
-
-
-def _save_settings(user_id: str, updates: dict):
-    current_app.settings.update_one(
-        {"user_id": user_id},
-        {"$set": {"user_id": user_id, **updates}},
-        upsert=True,
-    )
-
 
 @settings_bp.route("/settings", methods=["GET", "POST"])
 @login_required
@@ -59,18 +36,18 @@ def settings_page():
             "sessions_before_long_break": max(1, min(12, cycles)),
             "theme": theme,
         }
-        _save_settings(user_id, updates)
+        save_settings(user_id, updates)
         flash("Settings saved.", "success")
         return redirect(url_for("settings_bp.settings_page"))
 
-    settings = _get_settings(user_id)
+    settings = get_settings(user_id)
     return render_template("settings.html", active="settings", settings=settings)
 
 
 @settings_bp.route("/api/settings", methods=["GET"])
 @login_required
 def api_get_settings():
-    return jsonify(_get_settings(session["user_id"]))
+    return hashed_json(get_settings(session["user_id"]))
 
 
 @settings_bp.route("/api/settings", methods=["POST"])
@@ -103,5 +80,5 @@ def api_settings():
     if not updates:
         return jsonify({"ok": False, "error": "no_updates"}), 400
 
-    _save_settings(user_id, updates)
+    save_settings(user_id, updates)
     return jsonify({"ok": True})
@@ -1,44 +1,68 @@
-from flask import Blueprint, render_template, request, redirect, url_for, abort, session
+from datetime import datetime
+
+from flask import Blueprint, render_template, request, redirect, url_for, abort, session, jsonify
 
 from utils.auth import login_required
-from model.project_model import list_projects
-from model.tag_model import list_tags, ensure_tags_exist
+from model.project_model import list_projects, get_project
+from model.tag_model import list_tags
+from model.import_model import FORMATS as IMPORT_FORMATS, import_tasks
+from model.archive_model import restore_task
+from model.task_buckets import Bucket, bucketize
 from model.task_model import (
-    get_all_tasks_sorted,
+    get_tasks_page,
     get_task_by_id,
     insert_task,
     update_task,
     delete_task,
     toggle_task_complete,
+    bulk_update_tasks,
+    BULK_ACTIONS,
 )
 
 tasks_bp = Blueprint("tasks_bp", __name__)
 
+BULK_MAX_IDS = 500
+
 
 @tasks_bp.route("/tasklist")
 @login_required
 def task_list():
     sort_param = request.args.get("sort", "due_date")
     project_id = request.args.get("project") or ""
+    cursor = request.args.get("after") or None
+    archived = request.args.get("archived") == "1"
     user_id = session.get("user_id")
 
     projects = list_projects(user_id)
     project_name = {p["id"]: p["name"] for p in projects}
 
-    # filtered tasks
-    tasks = get_all_tasks_sorted(user_id, sort_param, project_id if project_id else None)
+    # filtered tasks, one keyset page at a time
+    tasks, next_cursor = get_tasks_page(
+        user_id, sort_param, project_id if project_id else None, cursor, include_archived=archived
+    )
 
-    # enrich for UI
-    for t in tasks:
-        pid = t.get("project_id")
-        t["project_name"] = project_name.get(pid, "No project") if pid else "No project"
+    # enrich for UI (project names are resolved lazily by the view) and count
+    # the page's open / done / overdue tasks in the same pass
+    today = datetime.utcnow().date()
+    page_counts = bucketize(
+        (t.bind(today, project_names=project_name) for t in tasks),
+        [
+            Bucket("open", when=lambda t: not t.completed),
+            Bucket("done", when=lambda t: t.completed),
+            Bucket("overdue", when=lambda t: not t.completed and t.due_status == "overdue"),
+        ],
+    )
 
     return render_template(
         "tasklist.html",
         tasks=tasks,
+        page_counts={name: r.count for name, r in page_counts.items()},
         sort=sort_param,
         projects=projects,
         project_id=project_id,
+        archived=archived,
+        cursor=cursor,
+        next_cursor=next_cursor,
     )
 
 
@@ -47,9 +71,6 @@ def task_list():
 def add_task():
     user_id = session.get("user_id")
 
-    # Ensure default tags exist (useful for demo + rubric)
-    ensure_tags_exist(user_id, ["Study", "Work", "Health", "Personal"])
-
     if request.method == "POST":
         tags_raw = request.form.get("tags", "")
         tags = [t.strip() for t in tags_raw.split(",") if t.strip()]
@@ -121,3 +142,63 @@ def toggle_complete(task_id):
     sort_param = request.args.get("sort", "due_date")
     project_id = request.args.get("project", "")
     return redirect(url_for("tasks_bp.task_list", sort=sort_param, project=project_id))
+
+
+@tasks_bp.route("/tasks/<task_id>/restore", methods=["POST"])
+@login_required
+def restore_task_route(task_id):
+    user_id = session.get("user_id")
+    restore_task(user_id, task_id)
+
+    sort_param = request.args.get("sort", "due_date")
+    project_id = request.args.get("project", "")
+    return redirect(url_for("tasks_bp.task_list", sort=sort_param, project=project_id, archived="1"))
+
+
+@tasks_bp.route("/api/tasks/bulk", methods=["POST"])
+@login_required
+def bulk_tasks():
+    user_id = session.get("user_id")
+    data = request.get_json(silent=True) or {}
+
+    action = data.get("action")
+    if action not in BULK_ACTIONS:
+        return jsonify({"ok": False, "error": "invalid_action"}), 400
+
+    ids = data.get("ids")
+    if not isinstance(ids, list) or not ids or len(ids) > BULK_MAX_IDS or not all(isinstance(i, str) for i in ids):
+        return jsonify({"ok": False, "error": "invalid_ids"}), 400
+
+    project_id = None
+    if action == "move":
+        project_id = data.get("project_id") or None
+        if project_id and not get_project(user_id, project_id):
+            return jsonify({"ok": False, "error": "invalid_project"}), 400
+
+    tags = None
+    if action in ("add_tags", "remove_tags"):
+        raw = data.get("tags")
+        tags = [t.strip() for t in raw if isinstance(t, str) and t.strip()] if isinstance(raw, list) else []
+        if not tags:
+            return jsonify({"ok": False, "error": "invalid_tags"}), 400
+
+    result = bulk_update_tasks(user_id, action, ids, project_id=project_id, tags=tags)
+    return jsonify({"ok": True, **result})
+
+
+@tasks_bp.route("/api/tasks/import", methods=["POST"])
+@login_required
+def import_tasks_api():
+    """Import tasks from CSV / NDJSON: a multipart `file` upload or the raw request body.
+
+    ?format=csv|ndjson (defaults from the file extension, else csv).
+    """
+    upload = request.files.get("file")
+    filename = (upload.filename if upload else "") or ""
+    fmt = request.args.get("format") or ("ndjson" if filename.endswith((".ndjson", ".jsonl")) else "csv")
+    if fmt not in IMPORT_FORMATS:
+        return jsonify({"ok": False, "error": "invalid_format"}), 400
+
+    stream = upload.stream if upload else request.stream
+    report = import_tasks(session["user_id"], stream, fmt)
+    return jsonify({"ok": True, **report})
@@ -4,27 +4,13 @@ from datetime import datetime
 from flask import Blueprint, render_template, request, jsonify, session, current_app
 
 from utils.auth import login_required
+from utils.conditional import versioned_json
 from model.task_model import get_all_tasks_sorted
+from model.session_model import MAX_BATCH, ingest_sessions
+from model.settings_model import get_settings
 
 timer_break_bp = Blueprint("timer_break_bp", __name__)
 
-DEFAULT_SETTINGS = {
-    "focus_minutes": 25,
-    "break_minutes": 5,
-    "long_break_minutes": 15,
-    "sessions_before_long_break": 4,
-    "theme": "light",
-}
-
-
-def _get_settings(user_id: str) -> dict:
-    doc = current_app.settings.find_one({"user_id": user_id}) or {}
-    out = dict(DEFAULT_SETTINGS)
-    for k in DEFAULT_SETTINGS:
-        if doc.get(k) is not None:
-            out[k] = doc.get(k)
-    return out
-
 
 def _serialize_sessions(docs):
     out = []
@@ -41,10 +27,10 @@ def _serialize_sessions(docs):
 @login_required
 def timer_page():
     user_id = session["user_id"]
-    settings = _get_settings(user_id)
+    settings = get_settings(user_id)
 
     tasks = get_all_tasks_sorted(user_id, "due_date")
-    open_tasks = [t for t in tasks if not t.get("completed")]
+    open_tasks = [t for t in tasks if not t.completed]
 
     return render_template(
         "timer.html",
@@ -58,7 +44,7 @@ def timer_page():
 @login_required
 def break_page():
     user_id = session["user_id"]
-    settings = _get_settings(user_id)
+    settings = get_settings(user_id)
 
     mode = request.args.get("mode", "break")
     if mode not in ("break", "long_break"):
@@ -84,36 +70,30 @@ def get_focus_sessions():
     limit = request.args.get("limit", type=int)
     limit = 10 if not limit or limit <= 0 or limit > 100 else limit
 
-    sessions = list(
-        current_app.focus_sessions.find({"user_id": user_id}).sort("created_at", -1).limit(limit)
-    )
-    return jsonify(_serialize_sessions(sessions))
+    def build():
+        sessions = list(
+            current_app.focus_sessions.find({"user_id": user_id}).sort("created_at", -1).limit(limit)
+        )
+        return _serialize_sessions(sessions)
+
+    return versioned_json("focus-sessions", user_id, build, limit)
+
+
+def _log_session(item: dict):
+    """Ingest one posted session; invalid ones get a 400 and write failures a 503 (retry later)."""
+    result = ingest_sessions(session["user_id"], [item])
+    if result["invalid"]:
+        return jsonify({"ok": False, **result}), 400
+    if result["failed"]:
+        return jsonify({"ok": False, **result}), 503
+    return jsonify({"ok": True, **result})
 
 
 @timer_break_bp.route("/api/focus-sessions", methods=["POST"])
 @login_required
 def log_focus_session():
-    user_id = session["user_id"]
     data = request.get_json(silent=True) or {}
-
-    minutes = data.get("minutes", DEFAULT_SETTINGS["focus_minutes"])
-    try:
-        minutes = int(minutes)
-    except (TypeError, ValueError):
-        minutes = DEFAULT_SETTINGS["focus_minutes"]
-    minutes = max(1, min(180, minutes))
-
-    task_id = data.get("task_id") or None
-
-    current_app.focus_sessions.insert_one(
-        {
-            "user_id": user_id,
-            "minutes": minutes,
-            "task_id": task_id,
-            "created_at": datetime.utcnow(),
-        }
-    )
-    return jsonify({"ok": True})
+    return _log_session({**data, "kind": "focus"})
 
 
 @timer_break_bp.route("/api/break-sessions", methods=["GET"])
@@ -123,35 +103,34 @@ def get_break_sessions():
     limit = request.args.get("limit", type=int)
     limit = 10 if not limit or limit <= 0 or limit > 100 else limit
 
-    sessions = list(
-        current_app.break_sessions.find({"user_id": user_id}).sort("created_at", -1).limit(limit)
-    )
-    return jsonify(_serialize_sessions(sessions))
+    def build():
+        sessions = list(
+            current_app.break_sessions.find({"user_id": user_id}).sort("created_at", -1).limit(limit)
+        )
+        return _serialize_sessions(sessions)
+
+    return versioned_json("break-sessions", user_id, build, limit)
 
 
 @timer_break_bp.route("/api/break-sessions", methods=["POST"])
 @login_required
 def log_break_session():
-    user_id = session["user_id"]
     data = request.get_json(silent=True) or {}
-
-    minutes = data.get("minutes", DEFAULT_SETTINGS["break_minutes"])
-    try:
-        minutes = int(minutes)
-    except (TypeError, ValueError):
-        minutes = DEFAULT_SETTINGS["break_minutes"]
-    minutes = max(1, min(90, minutes))
-
     mode = data.get("mode")
     if mode not in ("break", "long_break"):
         mode = "break"
+    return _log_session({**data, "kind": mode})
 
-    current_app.break_sessions.insert_one(
-        {
-            "user_id": user_id,
-            "minutes": minutes,
-            "mode": mode,
-            "created_at": datetime.utcnow(),
-        }
-    )
-    return jsonify({"ok": True})
+
+@timer_break_bp.route("/api/sessions/batch", methods=["POST"])
+@login_required
+def log_sessions_batch():
+    """Store queued sessions: {"sessions": [{"id", "kind", "minutes", "task_id", "ended_at"}, ...]}."""
+    data = request.get_json(silent=True) or {}
+    items = data.get("sessions")
+    if not isinstance(items, list) or not items:
+        return jsonify({"ok": False, "error": "invalid_sessions"}), 400
+    if len(items) > MAX_BATCH:
+        return jsonify({"ok": False, "error": "too_many_sessions", "max": MAX_BATCH}), 400
+
+    return jsonify({"ok": True, **ingest_sessions(session["user_id"], items)})
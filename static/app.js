@@ -1,3 +1,24 @@
+// Conditional GET: remember each URL's ETag and body for the tab, send
+// If-None-Match, and reuse the stored body when the server answers 304.
+window.tmFetchJson = async function(url){
+  const key = "tm_etag:" + url;
+  let cached = null;
+  try { cached = JSON.parse(sessionStorage.getItem(key) || "null"); } catch(e){}
+
+  const headers = {};
+  if(cached && cached.etag) headers["If-None-Match"] = cached.etag;
+  const res = await fetch(url, { headers, cache: "no-store" });
+
+  if(res.status === 304 && cached) return { data: cached.data, changed: false };
+  if(!res.ok) throw new Error(`${url}: ${res.status}`);
+
+  const data = await res.json();
+  const etag = res.headers.get("ETag");
+  if(etag){
+    try { sessionStorage.setItem(key, JSON.stringify({ etag, data })); } catch(e){}
+  }
+  return { data, changed: true };
+};
 
 (() => {
   const KEY = "tm_theme";
@@ -18,6 +39,15 @@
     apply(stored);
   }
 
+  // pick up a theme saved on another device; cheap 304 when nothing changed
+  if(document.getElementById("quickTheme")){
+    window.tmFetchJson("/api/settings").then(({ data }) => {
+      if((data.theme === "dark" || data.theme === "light") && data.theme !== getStored()){
+        apply(data.theme);
+      }
+    }).catch(() => {});
+  }
+
   // quick toggle (navbar button)
   const btn = document.getElementById("quickTheme");
   if(btn){
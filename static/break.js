@@ -42,15 +42,9 @@ function setRunningUi(isRunning) {
 }
 
 async function logBreak(minutes, mode) {
-  try {
-    await fetch("/api/break-sessions", {
-      method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ minutes, mode })
-    });
-  } catch (e) {
-    // ignore
-  }
+  // queued locally first (see sessions.js), so a failed request is retried, not lost
+  const kind = mode === "long_break" ? "long_break" : "break";
+  await window.tmSessions?.record({ kind, minutes });
 }
 
 function start() {
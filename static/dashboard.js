@@ -0,0 +1,36 @@
+// dashboard.js - load each dashboard section from /api/dashboard/<section> when it scrolls into view
+(function () {
+  const sections = Array.from(document.querySelectorAll(".tm-dashboard-section[data-url]"));
+  if (!sections.length) return;
+
+  function load(el) {
+    if (el.dataset.loaded) return;
+    el.dataset.loaded = "1";
+    // revalidates with the last ETag, so an unchanged section is a bodiless 304
+    window.tmFetchJson(el.dataset.url).then(({ data }) => {
+      el.innerHTML = data.html;
+      el.style.minHeight = "";
+    }).catch(() => {
+      delete el.dataset.loaded;
+      el.innerHTML =
+        '<div class="tm-card card p-4 text-center small opacity-75">Could not load this section. ' +
+        '<button class="btn btn-sm btn-link p-0 align-baseline" type="button">Retry</button></div>';
+      el.querySelector("button").addEventListener("click", () => load(el));
+    });
+  }
+
+  if (!("IntersectionObserver" in window)) {
+    sections.forEach(load);
+    return;
+  }
+
+  // sections the user never scrolls to are never requested (and never computed)
+  const observer = new IntersectionObserver((entries) => {
+    entries.forEach((entry) => {
+      if (!entry.isIntersecting) return;
+      observer.unobserve(entry.target);
+      load(entry.target);
+    });
+  }, { rootMargin: "200px 0px" });
+  sections.forEach((el) => observer.observe(el));
+})();
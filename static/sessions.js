@@ -0,0 +1,75 @@
+// sessions.js - offline-safe session logging for the timer and break pages.
+// Finished sessions are queued in localStorage with a client id and sent to
+// /api/sessions/batch; the server ignores ids it has already stored, so a
+// retry after a lost response never double-counts.
+(function () {
+  const QUEUE_KEY = "tm_sessionQueue";
+  const BATCH_SIZE = 50;
+  const RETRY_MS = 30000;
+  let flushing = null;
+
+  function load() {
+    try {
+      const q = JSON.parse(localStorage.getItem(QUEUE_KEY) || "[]");
+      return Array.isArray(q) ? q : [];
+    } catch (e) {
+      return [];
+    }
+  }
+
+  function save(queue) {
+    try { localStorage.setItem(QUEUE_KEY, JSON.stringify(queue)); } catch (e) {}
+  }
+
+  function newId() {
+    if (window.crypto?.randomUUID) return crypto.randomUUID();
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+  }
+
+  async function sendBatch(batch) {
+    const res = await fetch("/api/sessions/batch", {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ sessions: batch })
+    });
+    if (!res.ok) throw new Error(`batch: ${res.status}`);
+    const data = await res.json();
+    // stored now, stored earlier, or never storable: all can leave the queue
+    const done = new Set([...data.accepted, ...data.duplicates, ...data.invalid.map((x) => x.id)]);
+    save(load().filter((s) => !done.has(s.id)));
+    return data.failed.length === 0;
+  }
+
+  async function flushAll() {
+    let queue = load();
+    while (queue.length) {
+      if (!(await sendBatch(queue.slice(0, BATCH_SIZE)))) break;
+      const next = load();
+      if (next.length >= queue.length) break; // nothing was removed; try again later
+      queue = next;
+    }
+  }
+
+  function flush() {
+    // one flush at a time; callers share the in-flight promise
+    if (!flushing) {
+      flushing = flushAll().catch(() => {}).finally(() => (flushing = null));
+    }
+    return flushing;
+  }
+
+  window.tmSessions = {
+    // queue one finished session and try to deliver it (and anything older) now
+    record(session) {
+      const queue = load();
+      queue.push({ id: newId(), ended_at: Date.now(), ...session });
+      save(queue);
+      return flush();
+    },
+    flush
+  };
+
+  flush();
+  window.addEventListener("online", flush);
+  setInterval(flush, RETRY_MS);
+})();
@@ -0,0 +1,59 @@
+// tasklist.js - select several tasks and apply one action via /api/tasks/bulk
+(function () {
+  const bar = document.getElementById("bulkBar");
+  if (!bar) return;
+
+  const all = document.getElementById("bulkAll");
+  const count = document.getElementById("bulkCount");
+  const projectSelect = document.getElementById("bulkProject");
+  const boxes = Array.from(document.querySelectorAll(".tm-bulk-select"));
+  const buttons = Array.from(bar.querySelectorAll("[data-bulk-action]"));
+
+  function selectedIds() {
+    return boxes.filter((b) => b.checked).map((b) => b.value);
+  }
+
+  function refresh() {
+    const n = selectedIds().length;
+    if (count) count.textContent = n;
+    buttons.forEach((b) => (b.disabled = n === 0));
+    if (projectSelect) projectSelect.disabled = n === 0;
+    if (all) all.checked = n > 0 && n === boxes.length;
+  }
+
+  async function run(action, extra) {
+    const ids = selectedIds();
+    if (!ids.length) return;
+    if (action === "delete" && !confirm(`Delete ${ids.length} task(s)?`)) return;
+
+    try {
+      const res = await fetch("/api/tasks/bulk", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ action, ids, ...(extra || {}) })
+      });
+      if (!res.ok) {
+        const data = await res.json().catch(() => ({}));
+        alert(`Could not update tasks (${data.error || res.status}).`);
+        return;
+      }
+    } catch (e) {
+      alert("Could not reach the server.");
+      return;
+    }
+    window.location.reload();
+  }
+
+  boxes.forEach((b) => b.addEventListener("change", refresh));
+  all?.addEventListener("change", () => {
+    boxes.forEach((b) => (b.checked = all.checked));
+    refresh();
+  });
+  buttons.forEach((b) => b.addEventListener("click", () => run(b.dataset.bulkAction)));
+  projectSelect?.addEventListener("change", () => {
+    const value = projectSelect.value;
+    run("move", { project_id: value === "__none__" ? null : value });
+  });
+
+  refresh();
+})();
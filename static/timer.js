@@ -72,20 +72,10 @@ function setFocusCount(n) {
 }
 
 async function logSession(mode, minutes, taskId) {
-  const endpoint = mode === "focus" ? "/api/focus-sessions" : "/api/break-sessions";
-  const payload = { minutes };
+  // queued locally first (see sessions.js), so a failed request is retried, not lost
+  const payload = { kind: mode, minutes };
   if (mode === "focus" && taskId) payload.task_id = taskId;
-  if (mode !== "focus") payload.mode = mode;
-
-  try {
-    await fetch(endpoint, {
-      method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify(payload)
-    });
-  } catch (e) {
-    // ignore API errors so UI never crashes
-  }
+  await window.tmSessions?.record(payload);
 }
 
 function setRunningUi(isRunning) {
@@ -0,0 +1,178 @@
+"""Buffered audit log writer.
+
+Mutations call ``audit(user_id, action, payload)``, which only puts the event
+on a bounded in-process queue. A background thread drains the queue and
+writes events with ``insert_many`` whenever a batch fills up or the flush
+interval passes, so request threads never wait on the audit_logs collection.
+
+When the queue is full the writer either blocks the caller for a short time
+(``AUDIT_FULL_POLICY=block``, backpressure) or drops the event and counts it
+(``drop``, the default). Pending events are flushed at interpreter shutdown.
+"""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app
+from pymongo.errors import PyMongoError
+
+log = logging.getLogger(__name__)
+
+
+class AuditWriter:
+    def __init__(
+        self,
+        collection,
+        max_queue: int = 10000,
+        batch_size: int = 200,
+        flush_interval: float = 1.0,
+        full_policy: str = "drop",
+        block_timeout: float = 0.05,
+    ):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.full_policy = full_policy
+        self.block_timeout = block_timeout
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._pid: int | None = None
+
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.flushes = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+
+    # -----------------------
+    #  Producer side
+    # -----------------------
+    def enqueue(self, event: dict) -> bool:
+        self._ensure_started()
+        try:
+            if self.full_policy == "block":
+                self._queue.put(event, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(event)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        with self._lock:
+            self.enqueued += 1
+        return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "enqueued": self.enqueued,
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "flushes": self.flushes,
+                "last_flush_ms": round(self.last_flush_ms, 2),
+                "max_flush_ms": round(self.max_flush_ms, 2),
+            }
+
+    # -----------------------
+    #  Consumer side
+    # -----------------------
+    def _ensure_started(self):
+        # Threads do not survive fork(), so a pre-forking server gets one writer per worker.
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._flush(self._collect())
+        # drain whatever is left on shutdown
+        while not self._queue.empty():
+            self._flush(self._collect(wait=False))
+
+    def _collect(self, wait: bool = True) -> list[dict]:
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if not wait or timeout <= 0:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+                continue
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+            if self._stop.is_set():
+                wait = False
+        return batch
+
+    def _flush(self, batch: list[dict]):
+        if not batch:
+            return
+        started = time.perf_counter()
+        try:
+            self.collection.insert_many(batch, ordered=False)
+            ok = True
+        except PyMongoError:
+            log.exception("Failed to write %s audit event(s)", len(batch))
+            ok = False
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        with self._lock:
+            if ok:
+                self.written += len(batch)
+            else:
+                self.failed += len(batch)
+            self.flushes += 1
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+
+    def close(self, timeout: float = 5.0):
+        """Stop the background thread after flushing everything still queued."""
+        self._stop.set()
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            self._thread.join(timeout)
+        elif not self._queue.empty():
+            self._flush(self._collect(wait=False))
+
+
+def init_audit(app) -> AuditWriter:
+    writer = AuditWriter(
+        app.audit_logs,
+        max_queue=int(os.environ.get("AUDIT_QUEUE_SIZE", "10000")),
+        batch_size=int(os.environ.get("AUDIT_BATCH_SIZE", "200")),
+        flush_interval=float(os.environ.get("AUDIT_FLUSH_INTERVAL", "1.0")),
+        full_policy=os.environ.get("AUDIT_FULL_POLICY", "drop"),
+    )
+    app.audit_writer = writer
+    atexit.register(writer.close)
+    return writer
+
+
+def audit(user_id: str, action: str, payload: dict):
+    """Record an audit event without waiting for the database."""
+    current_app.audit_writer.enqueue(
+        {"user_id": user_id, "action": action, "created_at": datetime.utcnow(), "payload": payload}
+    )
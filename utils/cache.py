@@ -0,0 +1,279 @@
+"""Per-user versioned response cache.
+
+Every user has a data version (``data_versions`` collection, shared by all
+workers). Mutations that can change a cached view call
+``bump_data_version()``; cache keys embed the current version, so a write
+makes every older entry unreachable without explicit invalidation and the
+LRU simply ages them out.
+
+Backends:
+- ``memory`` (default): per-process LRU bounded by a byte budget.
+- ``redis``: shared across workers (``CACHE_REDIS_URL``); needs the optional
+  ``redis`` package.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable
+
+from flask import current_app
+from pymongo import ReturnDocument
+
+from utils.unit_of_work import forget_user
+
+log = logging.getLogger(__name__)
+
+
+class MemoryBackend:
+    """Thread-safe LRU keyed by string, evicting until under `max_bytes`."""
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.used_bytes = 0
+        self.evictions = 0
+        self._data: OrderedDict[str, tuple[bytes, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            self._data.move_to_end(key)
+            return item[0]
+
+    def set(self, key: str, value: bytes):
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.used_bytes -= old[1]
+            self._data[key] = (value, size)
+            self.used_bytes += size
+            while self.used_bytes > self.max_bytes:
+                _, (_, evicted) = self._data.popitem(last=False)
+                self.used_bytes -= evicted
+                self.evictions += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.used_bytes -= old[1]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._data), "bytes": self.used_bytes, "evictions": self.evictions}
+
+
+class RedisBackend:
+    """Shared backend; Redis itself enforces the byte budget via its maxmemory/LRU policy."""
+
+    def __init__(self, url: str, ttl_seconds: int = 86400):
+        try:
+            import redis
+        except ImportError as exc:  # optional dependency
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package") from exc
+        self._client = redis.Redis.from_url(url)
+        self.ttl_seconds = ttl_seconds
+
+    def get(self, key: str) -> bytes | None:
+        return self._client.get(key)
+
+    def set(self, key: str, value: bytes):
+        self._client.set(key, value, ex=self.ttl_seconds)
+
+    def delete(self, key: str):
+        self._client.delete(key)
+
+    def stats(self) -> dict:
+        return {}
+
+
+class ResponseCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        raw = self.backend.get(key)
+        if raw is not None:
+            with self._lock:
+                self.hits += 1
+            return pickle.loads(raw)
+
+        with self._lock:
+            self.misses += 1
+        value = compute()
+        self.backend.set(key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        return value
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, **self.backend.stats()}
+
+
+class TTLCache:
+    """Thread-safe LRU of live objects whose entries also expire after `ttl` seconds.
+
+    Invalidation during a load wins: a value read before `invalidate()` ran is
+    returned to its caller but never stored.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[Any, tuple[float, Any]] = OrderedDict()
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key, load: Callable[[], Any]) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[0] > now:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            self.misses += 1
+            epoch = self._epoch
+
+        value = load()
+        with self._lock:
+            if epoch == self._epoch:
+                self._data[key] = (time.monotonic() + self.ttl, value)
+                self._data.move_to_end(key)
+                while len(self._data) > self.max_entries:
+                    self._data.popitem(last=False)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+            self._epoch += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._epoch += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._data)}
+
+
+class RedisInvalidationChannel:
+    """Fan `invalidate(key)` out to every worker's TTLCache over Redis pub/sub."""
+
+    def __init__(self, url: str, channel: str, cache: TTLCache):
+        try:
+            import redis
+        except ImportError as exc:  # optional dependency
+            raise RuntimeError("Cross-worker invalidation requires the 'redis' package") from exc
+        self._client = redis.Redis.from_url(url)
+        self.channel = channel
+        self.cache = cache
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._pid: int | None = None
+
+    def publish(self, key: str):
+        self.start()
+        try:
+            self._client.publish(self.channel, key)
+        except Exception:  # the TTL still bounds staleness on other workers
+            log.exception("Could not publish invalidation for %s", key)
+
+    def start(self):
+        # One listener per process; threads do not survive a pre-forking server's fork().
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._listen, name=f"{self.channel}-listener", daemon=True)
+            self._thread.start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                # anything published while we were disconnected is lost, so start clean
+                self.cache.clear()
+                for message in pubsub.listen():
+                    key = message.get("data")
+                    self.cache.invalidate(key.decode() if isinstance(key, bytes) else key)
+            except Exception:
+                log.exception("Invalidation listener on %s failed; reconnecting", self.channel)
+                time.sleep(1.0)
+
+
+def init_cache(app) -> ResponseCache:
+    backend_name = os.environ.get("CACHE_BACKEND", "memory")
+    if backend_name == "redis":
+        backend = RedisBackend(
+            os.environ.get("CACHE_REDIS_URL", "redis://localhost:6379/0"),
+            ttl_seconds=int(os.environ.get("CACHE_TTL_SECONDS", "86400")),
+        )
+    else:
+        backend = MemoryBackend(max_bytes=int(os.environ.get("CACHE_MAX_BYTES", str(32 * 1024 * 1024))))
+    app.response_cache = ResponseCache(backend)
+    return app.response_cache
+
+
+# -----------------------
+#  Per-user data versions
+# -----------------------
+def data_version_info(user_id: str) -> tuple[int, datetime | None]:
+    """(version, time of the last bump) for a user; (0, None) before any write."""
+    doc = current_app.data_versions.find_one({"_id": user_id}, {"v": 1, "updated_at": 1})
+    if not doc:
+        return 0, None
+    return int(doc.get("v", 0)), doc.get("updated_at")
+
+
+def data_version(user_id: str) -> int:
+    return data_version_info(user_id)[0]
+
+
+def bump_data_version(user_id: str) -> int:
+    """Mark the user's data as changed; call after any write that affects cached views."""
+    # HTTP dates have one-second resolution, so store what Last-Modified can express.
+    now = datetime.utcnow().replace(microsecond=0)
+    doc = current_app.data_versions.find_one_and_update(
+        {"_id": user_id},
+        {"$inc": {"v": 1}, "$set": {"updated_at": now}},
+        projection={"v": 1},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    forget_user(user_id)
+    return int(doc["v"])
+
+
+def cached(namespace: str, user_id: str, compute: Callable[[], Any], *key_parts, version: int | None = None) -> Any:
+    """Return `compute()` cached under the user's current data version.
+
+    Pass `version` when the caller already read it (``versioned_json``), so the
+    ETag and the cache key come from the same read.
+    """
+    if version is None:
+        version = data_version(user_id)
+    parts = ":".join(str(p) for p in key_parts)
+    key = f"{namespace}:{user_id}:{version}:{parts}"
+    return current_app.response_cache.get_or_compute(key, compute)
@@ -0,0 +1,65 @@
+"""Conditional GET support for the JSON APIs.
+
+Versioned endpoints derive a strong ETag from the user's data version (see
+``utils.cache``) and answer ``If-None-Match`` / ``If-Modified-Since`` with a
+304 before any payload query runs. Endpoints without a version fall back to
+hashing the serialized body, which still saves the transfer.
+
+Responses carry ``Cache-Control: private, no-cache`` so browsers keep a copy
+but revalidate it on every use.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from datetime import datetime, timezone
+from typing import Any, Callable
+
+from flask import Response, current_app, jsonify, request
+
+from utils.cache import cached, data_version_info
+
+CACHE_CONTROL = "private, no-cache"
+
+
+def _finish(resp: Response, etag: str, last_modified: datetime | None = None) -> Response:
+    resp.set_etag(etag)
+    if last_modified is not None:
+        resp.last_modified = last_modified
+    resp.headers["Cache-Control"] = CACHE_CONTROL
+    resp.vary.add("Cookie")
+    return resp
+
+
+def _not_modified(etag: str, last_modified: datetime | None) -> bool:
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    since = request.if_modified_since
+    return bool(since and last_modified and last_modified <= since)
+
+
+def versioned_json(namespace: str, user_id: str, build: Callable[[], Any], *key_parts, cache: bool = False) -> Response:
+    """JSON response for `build()`, or a bodiless 304 if the client's copy is current.
+
+    With `cache`, `build()` goes through the response cache under the same
+    data version the ETag was made from (one version read per request).
+    """
+    version, updated_at = data_version_info(user_id)
+    last_modified = updated_at.replace(tzinfo=timezone.utc) if updated_at else None
+
+    raw = ":".join(str(p) for p in (namespace, user_id, *key_parts))
+    etag = f"{namespace}-{version}-{hashlib.sha1(raw.encode()).hexdigest()[:16]}"
+
+    if _not_modified(etag, last_modified):
+        return _finish(current_app.response_class(status=304), etag, last_modified)
+    payload = cached(namespace, user_id, build, *key_parts, version=version) if cache else build()
+    return _finish(jsonify(payload), etag, last_modified)
+
+
+def hashed_json(payload: Any) -> Response:
+    """JSON response with an ETag over its body, for data without a version counter."""
+    resp = jsonify(payload)
+    etag = hashlib.sha1(resp.get_data()).hexdigest()
+    if request.if_none_match and request.if_none_match.contains(etag):
+        resp = current_app.response_class(status=304)
+    return _finish(resp, etag)
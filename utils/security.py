@@ -1,43 +1,154 @@
 import os
 import hashlib
+import hmac
 import binascii
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from flask import current_app
 
 # SALT length in bytes
 SALT_LEN = 16
+KEY_LEN = 32
 
-def hash_password(password: str) -> dict:
+KDFS = ("scrypt", "pbkdf2_sha256")
+
+
+class HashingBusy(RuntimeError):
+    """Raised when the hashing pool's queue is full; the caller should ask the user to retry."""
+
+
+# -----------------------
+#  KDF parameters
+# -----------------------
+def current_kdf() -> dict:
     """
-    Hash password using SHA256 + salt + pepper.
-    Returns dict: {"salt": ..., "hash": ...}
+    KDF parameters new hashes are made with, from app config (see app.py).
+    Stored next to each user's hash so they can change without breaking logins.
     """
+    cfg = current_app.config
+    name = cfg.get("PASSWORD_KDF", "scrypt")
+    if name == "pbkdf2_sha256":
+        return {"name": name, "iterations": int(cfg.get("PBKDF2_ITERATIONS", 600_000))}
+    return {
+        "name": "scrypt",
+        "n": int(cfg.get("SCRYPT_N", 2**14)),
+        "r": int(cfg.get("SCRYPT_R", 8)),
+        "p": int(cfg.get("SCRYPT_P", 1)),
+    }
 
-    # Generate a random salt
-    salt = os.urandom(SALT_LEN)
 
-    # Pepper (global secret)
+def _derive(password: bytes, salt: bytes, kdf: dict | None) -> bytes:
+    if kdf is None:
+        # legacy accounts: a single SHA-256 pass over salt + password + pepper
+        return hashlib.sha256(salt + password).digest()
+    if kdf["name"] == "scrypt":
+        n, r, p = kdf["n"], kdf["r"], kdf["p"]
+        return hashlib.scrypt(password, salt=salt, n=n, r=r, p=p, maxmem=256 * r * n * p, dklen=KEY_LEN)
+    if kdf["name"] == "pbkdf2_sha256":
+        return hashlib.pbkdf2_hmac("sha256", password, salt, kdf["iterations"], dklen=KEY_LEN)
+    raise ValueError(f"Unknown KDF {kdf['name']!r}")
+
+
+def needs_rehash(kdf: dict | None) -> bool:
+    """True for legacy SHA-256 hashes and hashes made with other parameters than today's."""
+    return kdf != current_kdf()
+
+
+# -----------------------
+#  Bounded hashing pool
+# -----------------------
+# A slow KDF is CPU-bound (hashlib releases the GIL while it runs). Hashing in
+# a small pool caps how many cores logins can take at once, and the bounded
+# queue turns a login burst into quick "busy" errors instead of a stalled worker.
+_pool: ThreadPoolExecutor | None = None
+_pool_pid: int | None = None
+_slots: threading.BoundedSemaphore | None = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> tuple[ThreadPoolExecutor, threading.BoundedSemaphore]:
+    global _pool, _pool_pid, _slots
+    if _pool is not None and _pool_pid == os.getpid():
+        return _pool, _slots
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            workers = int(current_app.config.get("HASH_WORKERS", os.cpu_count() or 2))
+            _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+            _slots = threading.BoundedSemaphore(workers * int(current_app.config.get("HASH_QUEUE_PER_WORKER", 4)))
+            _pool_pid = os.getpid()
+        return _pool, _slots
+
+
+def _run_hash(password: str, salt: bytes, kdf: dict | None) -> bytes:
     pepper = current_app.config.get("PEPPER", "")
+    pwd = password.encode("utf-8") + pepper.encode("utf-8")
+    pool, slots = _get_pool()
+    if not slots.acquire(timeout=float(current_app.config.get("HASH_QUEUE_TIMEOUT", 2.0))):
+        raise HashingBusy("Too many password hashes in flight")
+    try:
+        return pool.submit(_derive, pwd, salt, kdf).result()
+    finally:
+        slots.release()
 
-    # Combine password + salt + pepper
-    pwd = password.encode("utf-8")
-    combined = salt + pwd + pepper.encode("utf-8")
 
-    hashed = hashlib.sha256(combined).digest()
+# -----------------------
+#  Public API
+# -----------------------
+def hash_password(password: str, kdf: dict | None = None) -> dict:
+    """
+    Hash password with the configured KDF + salt + pepper.
+    Returns dict: {"salt": ..., "hash": ..., "kdf": {...params}}
+    """
+
+    # Generate a random salt
+    salt = os.urandom(SALT_LEN)
+    kdf = kdf or current_kdf()
+    hashed = _run_hash(password, salt, kdf)
 
     return {
         "salt": binascii.hexlify(salt).decode(),
-        "hash": binascii.hexlify(hashed).decode()
+        "hash": binascii.hexlify(hashed).decode(),
+        "kdf": kdf,
     }
 
 
-def verify_password(password: str, salt_hex: str, stored_hash: str) -> bool:
+def verify_password(password: str, salt_hex: str, stored_hash: str, kdf: dict | None = None) -> bool:
     """
     Check if password matches stored hash.
+    `kdf` is the user's stored parameters; None means a legacy SHA-256 hash.
     """
-    pepper = current_app.config.get("PEPPER", "")
     salt = binascii.unhexlify(salt_hex)
+    check_hash = _run_hash(password, salt, kdf)
+
+    return hmac.compare_digest(binascii.hexlify(check_hash).decode(), stored_hash)
+
+
+def calibrate_kdf(name: str, target_ms: float) -> tuple[dict, float]:
+    """
+    Find the cheapest parameters for `name` whose single hash takes at least
+    `target_ms` on this machine. Returns (params, measured ms).
+    """
+
+    def measure(kdf: dict) -> float:
+        started = time.perf_counter()
+        _derive(b"calibration-password", os.urandom(SALT_LEN), kdf)
+        return (time.perf_counter() - started) * 1000
+
+    if name == "pbkdf2_sha256":
+        # cost is linear in iterations, so scale from one probe and confirm
+        probe = {"name": name, "iterations": 50_000}
+        iterations = max(10_000, int(probe["iterations"] * target_ms / max(measure(probe), 0.01)))
+        kdf = {"name": name, "iterations": iterations}
+        return kdf, measure(kdf)
 
-    combined = salt + password.encode("utf-8") + pepper.encode("utf-8")
-    check_hash = hashlib.sha256(combined).digest()
+    if name == "scrypt":
+        kdf = {"name": name, "n": 2**12, "r": 8, "p": 1}
+        elapsed = measure(kdf)
+        # doubling N doubles both time and memory (128 * r * N bytes)
+        while elapsed < target_ms and kdf["n"] < 2**20:
+            kdf = {**kdf, "n": kdf["n"] * 2}
+            elapsed = measure(kdf)
+        return kdf, elapsed
 
-    return binascii.hexlify(check_hash).decode() == stored_hash
+    raise ValueError(f"Unknown KDF {name!r}")
@@ -0,0 +1,155 @@
+"""Request-scoped identity map for model reads.
+
+Each request gets a ``UnitOfWork`` on ``flask.g``. Model reads go through it:
+
+- ``read()`` memoizes whole results (a user's project list, tag names)
+- ``get_many()`` keeps one object per (collection, user, id) and loads the
+  ids it has not seen yet with a single ``$in`` query
+
+so asking for the same data again within a request never reaches MongoDB.
+Writes call ``bump_data_version()`` (see ``utils.cache``), which also drops
+the user's entries here, so a read after a write sees the new data.
+
+Outside a request (CLI commands, background threads) there is no unit of
+work and reads go straight to the database.
+
+With ``QUERY_STATS=1`` a command listener is registered on the client and
+counts the MongoDB commands each request sends; the count is returned in an
+``X-DB-Queries`` header and logged per endpoint. Without it no listener runs.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from collections import Counter
+from typing import Any, Callable, Iterable
+
+from flask import g, has_request_context, request
+from pymongo import monitoring
+
+log = logging.getLogger(__name__)
+
+
+class UnitOfWork:
+    def __init__(self):
+        self._reads: dict[tuple, Any] = {}
+        self._entities: dict[tuple, Any] = {}
+        self.hits = 0
+
+    def read(self, namespace: str, user_id: str, load: Callable[[], Any], *key) -> Any:
+        """`load()` once per request for (namespace, user_id, *key)."""
+        k = (namespace, user_id, *key)
+        if k in self._reads:
+            self.hits += 1
+            return self._reads[k]
+        value = self._reads[k] = load()
+        return value
+
+    def get_many(
+        self, collection: str, user_id: str, ids: Iterable[str], load_many: Callable[[list[str]], dict]
+    ) -> dict:
+        """{id: object} for `ids`; `load_many(missing_ids)` fetches the unseen ones in one query.
+
+        Ids that do not exist are remembered too (as None) and left out of the result.
+        """
+        wanted = list(dict.fromkeys(ids))
+        missing = [i for i in wanted if (collection, user_id, i) not in self._entities]
+        self.hits += len(wanted) - len(missing)
+        if missing:
+            found = load_many(missing)
+            for i in missing:
+                self._entities[(collection, user_id, i)] = found.get(i)
+        out = {}
+        for i in wanted:
+            obj = self._entities[(collection, user_id, i)]
+            if obj is not None:
+                out[i] = obj
+        return out
+
+    def seed(self, collection: str, user_id: str, objects: dict):
+        """Register objects another read already loaded, e.g. every project from the project list."""
+        for i, obj in objects.items():
+            self._entities.setdefault((collection, user_id, i), obj)
+
+    def forget(self, user_id: str):
+        self._reads = {k: v for k, v in self._reads.items() if k[1] != user_id}
+        self._entities = {k: v for k, v in self._entities.items() if k[1] != user_id}
+
+
+def current_uow() -> UnitOfWork | None:
+    if not has_request_context():
+        return None
+    uow = g.get("uow")
+    if uow is None:
+        uow = g.uow = UnitOfWork()
+    return uow
+
+
+def request_read(namespace: str, user_id: str, load: Callable[[], Any], *key) -> Any:
+    """Memoized `load()` inside a request, a plain call outside one."""
+    uow = current_uow()
+    return uow.read(namespace, user_id, load, *key) if uow else load()
+
+
+def request_get_many(collection: str, user_id: str, ids: Iterable[str], load_many: Callable[[list[str]], dict]) -> dict:
+    """Identity-mapped ``load_many`` inside a request, a plain call outside one."""
+    uow = current_uow()
+    if uow:
+        return uow.get_many(collection, user_id, ids, load_many)
+    found = load_many(list(dict.fromkeys(ids)))
+    return {i: obj for i, obj in found.items() if obj is not None}
+
+
+def request_seed(collection: str, user_id: str, objects: dict):
+    uow = current_uow()
+    if uow:
+        uow.seed(collection, user_id, objects)
+
+
+def forget_user(user_id: str):
+    """Drop the current request's memoized reads for `user_id` (after a write)."""
+    if has_request_context() and g.get("uow") is not None:
+        g.uow.forget(user_id)
+
+
+def query_stats_enabled() -> bool:
+    return os.environ.get("QUERY_STATS", "0") == "1"
+
+
+class QueryCounter(monitoring.CommandListener):
+    """Counts the commands sent while a request is being handled (published on the calling thread).
+
+    Counts go to ``g.db_commands``; the listener never creates a unit of work.
+    """
+
+    def started(self, event):
+        if has_request_context():
+            if "db_commands" not in g:
+                g.db_commands = Counter()
+            g.db_commands[event.command_name] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def query_listeners() -> list:
+    """``event_listeners`` for the MongoClient: the counter only when ``QUERY_STATS=1``."""
+    return [QueryCounter()] if query_stats_enabled() else []
+
+
+def init_unit_of_work(app):
+    app.config["QUERY_STATS"] = query_stats_enabled()
+
+    @app.after_request
+    def _query_stats(response):
+        if app.config["QUERY_STATS"]:
+            commands = g.get("db_commands") or Counter()
+            uow = g.get("uow")
+            stats = {"queries": sum(commands.values()), "hits": uow.hits if uow else 0, "commands": dict(commands)}
+            response.headers["X-DB-Queries"] = str(stats["queries"])
+            log.info("%s %s: %s", request.method, request.endpoint, stats)
+        return response